@@ -0,0 +1,108 @@
+import http.client
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+# Where the warm analytics daemon (analytics_server.py) listens
+DAEMON_HOST = os.getenv('ANALYTICS_HOST', '127.0.0.1')
+DAEMON_PORT = int(os.getenv('ANALYTICS_PORT', '8765'))
+DAEMON_TIMEOUT = float(os.getenv('ANALYTICS_TIMEOUT', '30'))
+
+# Method name -> script that implements it when run as a fresh process
+SCRIPTS = {
+    'predict_mood': 'predict_mood.py',
+    'recommend_exercises': 'recommend_excercises.py',
+    'compute_recommendations': 'recommend_consultants.py',
+    'onboard': 'onboarding_pipeline.py',
+}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def call_daemon(method, user_id, timeout=None):
+    """
+    Run `method` for `user_id` inside the warm daemon and return its decoded JSON result.
+    Raises DaemonUnavailable if the daemon is not running or the call fails.
+    """
+    conn = http.client.HTTPConnection(DAEMON_HOST, DAEMON_PORT, timeout=timeout or DAEMON_TIMEOUT)
+    try:
+        conn.request('GET', f'/{method}?user_id={int(user_id)}')
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise DaemonUnavailable(f"daemon returned HTTP {response.status} for {method}")
+        return json.loads(body)
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        raise DaemonUnavailable(str(e))
+    finally:
+        conn.close()
+
+
+def run(method, user_id, fallback):
+    """
+    Thin-client entry point used by the CLI scripts: ask the daemon first and fall back
+    to running `fallback(user_id)` in this process if it is unreachable.
+    Set ANALYTICS_NO_DAEMON=1 to always run in-process.
+    """
+    if os.getenv('ANALYTICS_NO_DAEMON') != '1':
+        try:
+            return call_daemon(method, user_id)
+        except DaemonUnavailable as e:
+            logging.info(f"Analytics daemon unavailable for {method} ({e}); running in-process")
+    return fallback(user_id)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _summary(samples):
+    return {
+        'runs': len(samples),
+        'mean_ms': round(sum(samples) / len(samples), 2),
+        'p50_ms': round(_percentile(samples, 50), 2),
+        'p95_ms': round(_percentile(samples, 95), 2),
+    }
+
+
+def benchmark(method, user_id, runs=10):
+    """
+    Compare per-call latency of spawning a fresh interpreter (the old shell_exec path)
+    with a call into the running daemon.
+    """
+    script = os.path.join(BASE_DIR, SCRIPTS[method])
+    env = dict(os.environ, ANALYTICS_NO_DAEMON='1')
+
+    spawn = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, str(user_id)], env=env, capture_output=True)
+        spawn.append((time.perf_counter() - start) * 1000)
+
+    daemon = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call_daemon(method, user_id)
+        daemon.append((time.perf_counter() - start) * 1000)
+
+    return {'method': method, 'spawn': _summary(spawn), 'daemon': _summary(daemon)}
+
+
+if __name__ == "__main__":
+    # Usage: python analytics_client.py <method> <user_id>
+    #        python analytics_client.py bench <method> <user_id> [runs]
+    if len(sys.argv) >= 4 and sys.argv[1] == 'bench':
+        runs = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+        print(json.dumps(benchmark(sys.argv[2], int(sys.argv[3]), runs), indent=2))
+    elif len(sys.argv) == 3 and sys.argv[1] in SCRIPTS:
+        print(json.dumps(call_daemon(sys.argv[1], int(sys.argv[2]))))
+    else:
+        sys.exit("Usage: analytics_client.py <method> <user_id> | bench <method> <user_id> [runs]")
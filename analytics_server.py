@@ -0,0 +1,134 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import log_config
+
+# Before the analytics modules, whose own setup_logging calls then leave this in place
+log_config.setup_logging('analytics_server', console=True)
+
+# Import the analytics modules once so numpy and the models stay loaded for every call
+import catalog_cache
+import db
+import onboarding_pipeline
+import predict_mood
+import recommend_excercises
+import recommend_consultants
+from analytics_client import DAEMON_HOST, DAEMON_PORT
+from recompute_queue import RecomputeQueue
+
+METHODS = {
+    'predict_mood': predict_mood.predict_mood,
+    'recommend_exercises': recommend_excercises.recommend_exercises,
+    'compute_recommendations': recommend_consultants.compute_recommendations,
+    'onboard': onboarding_pipeline.onboard,
+}
+
+# Rolling per-method latency samples (milliseconds) reported on /stats
+LATENCY_WINDOW = 1000
+latencies = {name: deque(maxlen=LATENCY_WINDOW) for name in METHODS}
+latencies_lock = threading.Lock()
+
+
+# Catalog and roster changes are pushed to the affected users in the background
+recompute = RecomputeQueue()
+
+
+def fan_out_exercises(_):
+    with db.connection() as conn:
+        user_ids = recommend_excercises.stale_users(conn, catalog_cache.exercises.all())
+    for user_id in user_ids:
+        recompute.submit('recommend_exercises', user_id)
+    logging.info(f"Queued exercise recommendations for {len(user_ids)} affected users")
+
+
+recompute.register('recommend_exercises', recommend_excercises.recommend_exercises)
+recompute.register('exercise_fanout', fan_out_exercises)
+# Every user's top 5 can move with the roster; rescoring is one matrix product per
+# chunk and the bulk writer only touches users whose results changed
+recompute.register('consultant_rescore', lambda _: recommend_consultants.rescore_all())
+catalog_cache.exercises.listeners.append(lambda old, new: recompute.submit('exercise_fanout'))
+catalog_cache.consultants.listeners.append(lambda old, new: recompute.submit('consultant_rescore'))
+
+
+def latency_stats():
+    stats = {}
+    with latencies_lock:
+        for name, samples in latencies.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            stats[name] = {
+                'calls': len(ordered),
+                'mean_ms': round(sum(ordered) / len(ordered), 2),
+                'p50_ms': round(ordered[len(ordered) // 2], 2),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            }
+    return stats
+
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        name = url.path.strip('/')
+
+        if name == 'health':
+            return self.send_json(200, {'status': 'ok'})
+        if name == 'stats':
+            return self.send_json(200, {**latency_stats(), 'catalogs': catalog_cache.stats(),
+                                        'stages': log_config.timing_summary(),
+                                        'recompute': recompute.stats()})
+        if name not in METHODS:
+            return self.send_json(404, {'error': f'Unknown method {name}'})
+
+        try:
+            user_id = int(parse_qs(url.query)['user_id'][0])
+        except (KeyError, ValueError):
+            return self.send_json(400, {'error': 'user_id must be an integer'})
+
+        start = time.perf_counter()
+        try:
+            result = METHODS[name](user_id)
+        except Exception as e:
+            logging.error(f"Daemon call {name} failed for user_id {user_id}: {e}")
+            return self.send_json(500, {'error': str(e)})
+        elapsed = (time.perf_counter() - start) * 1000
+        with latencies_lock:
+            latencies[name].append(elapsed)
+        logging.debug("%s(%s) served in %.1f ms", name, user_id, elapsed)
+        self.send_json(200, result)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("analytics_server: " + format % args)
+
+
+def serve(host=DAEMON_HOST, port=DAEMON_PORT):
+    for catalog in catalog_cache.CATALOGS:
+        try:
+            catalog.refresh()
+        except Exception as e:
+            logging.error(f"Could not preload the {catalog.name} catalog: {e}")
+    recompute.start()
+    server = ThreadingHTTPServer((host, port), AnalyticsHandler)
+    server.daemon_threads = True
+    logging.info(f"Analytics daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,53 +1,87 @@
-from flask import Flask, request, render_template, jsonify
-import pandas as pd
-import torch
-import faiss
+from flask import Flask, Response, request, render_template, jsonify, stream_with_context
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
-import openai
-import pickle
+from openai import OpenAI
 import os
+import json
+import threading
+import time
+import embeddings
+from embeddings import EmbeddingBatcher
+from chat_cache import answer_key, create_caches, normalize_question
+from llm_stream import stream_chat
+from build_index import INDEX_FILE, MANIFEST_FILE, OFFSETS_FILE, TEXTS_FILE
+from doc_store import DocStore
+from vector_index import load_index
 
 app = Flask(__name__)
 
-# Device configuration
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
 # Set your OpenAI API key (ensure this is secure in production)
-openai.api_key = "XXXXXXXXXXXX"
-# Load CSV knowledge base
-df = pd.read_csv(r"C:\xampp\htdocs\Companion\CompanionX.csv")  # Update path as needed
+# OPENAI_BASE_URL can point at fake_llm_server.py for offline and load testing
+llm_client = OpenAI(
+    api_key=os.getenv('OPENAI_API_KEY', 'XXXXXXXXXXXX'),
+    base_url=os.getenv('OPENAI_BASE_URL') or None
+)
+# Concurrent questions share one padded forward pass (see embeddings.py). The model
+# loads in the background so /health answers while it is still warming up.
+embedding_batcher = EmbeddingBatcher()
+embeddings.warm_up()
+
+# Repeated questions skip the model (embedding cache) and the LLM round trip (answer cache)
+embedding_cache, answer_cache = create_caches()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Knowledge-base texts written by build_index.py from CompanionX.csv (memory-mapped)
+doc_store = DocStore(
+    os.getenv('COMPANION_TEXTS_PATH', os.path.join(BASE_DIR, TEXTS_FILE)),
+    os.getenv('COMPANION_OFFSETS_PATH', os.path.join(BASE_DIR, OFFSETS_FILE))
+)
 
-# Load Sentence Transformer model
-embedding_tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
-embedding_model = AutoModel.from_pretrained("sentence-transformers/all-MiniLM-L6-v2").to(device)
+# Load the FAISS index written by build_index.py (memory-mapped, shared across workers)
+index, index_ids, index_manifest = load_index(
+    os.getenv('COMPANION_INDEX_PATH', os.path.join(BASE_DIR, INDEX_FILE)),
+    os.getenv('COMPANION_MANIFEST_PATH', os.path.join(BASE_DIR, MANIFEST_FILE)),
+    nprobe=os.getenv('COMPANION_NPROBE'),
+    ef_search=os.getenv('COMPANION_EF_SEARCH')
+)
 
-# Load FAISS index and saved article embeddings
-with open("article_embeddings.pkl", "rb") as f:
-    article_embeddings = pickle.load(f)
+# Context budget and packing: 'relevance' fills in retrieval order,
+# 'density' prefers documents with the best relevance per token
+RETRIEVAL_K = int(os.getenv('RETRIEVAL_K', '3'))
+CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', '1536'))
+CONTEXT_PACKING = os.getenv('CONTEXT_PACKING', 'relevance')
+DOC_OVERHEAD_TOKENS = 2  # "- " prefix and newline around each document
 
-dimension = len(article_embeddings[0])
-index = faiss.IndexFlatL2(dimension)
-index.add(np.array(article_embeddings))
+# Each /stream response holds a server thread until its completion ends; past this
+# many at once, new streams get a 503 so the rest of the app keeps free threads
+STREAM_MAX_CONCURRENT = int(os.getenv('STREAM_MAX_CONCURRENT', '32'))
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONCURRENT)
+
+# Chat-model token counts measured at build time, indexed by row id
+doc_token_counts = None
+if 'token_counts' in index_manifest:
+    doc_token_counts = np.zeros(int(index_ids.max()) + 1, dtype=np.int64)
+    doc_token_counts[index_ids] = index_manifest['token_counts']
 
 # ---------------------- Embedding Function ----------------------
 def generate_embeddings(text):
-    inputs = embedding_tokenizer(
-        text,
-        return_tensors="pt",
-        padding=True,
-        truncation=True,
-        max_length=512
-    ).to(device)
-
-    with torch.no_grad():
-        outputs = embedding_model(**inputs)
-    return outputs.last_hidden_state.mean(dim=1).squeeze().cpu().numpy()
+    return embedding_batcher.embed(text)
+
+def cached_embedding(question):
+    embedding = embedding_cache.get(question)
+    if embedding is None:
+        embedding = generate_embeddings(question)
+        embedding_cache.put(question, embedding)
+    return embedding
 
 # ---------------------- Document Retrieval ----------------------
+def search_documents(query_embedding, k=RETRIEVAL_K):
+    distances, indices = index.search(np.array([query_embedding], dtype=np.float32), k)
+    found = indices[0] >= 0
+    return index_ids[indices[0][found]], 1.0 / (1.0 + distances[0][found])
+
 def retrieve_documents(query_embedding, k=3):
-    distances, indices = index.search(np.array([query_embedding]), k)
-    return indices[0]
+    return search_documents(query_embedding, k)[0]
 
 # ---------------------- Context Processing ----------------------
 def process_context(docs, max_tokens=1536):
@@ -62,8 +96,28 @@ def process_context(docs, max_tokens=1536):
             break
     return "\n".join(f"- {doc}" for doc in processed_docs)
 
+def pack_documents(doc_ids, scores, max_tokens=CONTEXT_MAX_TOKENS, strategy=CONTEXT_PACKING):
+    # Greedy fill using precomputed token counts: no text is scanned per request
+    costs = doc_token_counts[doc_ids] + DOC_OVERHEAD_TOKENS
+    order = range(len(doc_ids))
+    if strategy == 'density':
+        order = np.argsort(-(scores / costs), kind='stable')
+    chosen = []
+    total_tokens = 0
+    for i in order:
+        if total_tokens + costs[i] <= max_tokens:
+            chosen.append(i)
+            total_tokens += costs[i]
+    return doc_ids[np.array(sorted(chosen), dtype=np.int64)]
+
+def build_context(doc_ids, scores):
+    if doc_token_counts is None:
+        # Index built before token counts were stored
+        return process_context(doc_store.get_many(doc_ids), CONTEXT_MAX_TOKENS)
+    return "\n".join(f"- {doc}" for doc in doc_store.get_many(pack_documents(doc_ids, scores)))
+
 # ---------------------- GPT-4 Answer Generation ----------------------
-def generate_answer_with_gpt4(question, context, max_tokens=300):
+def build_messages(question, context):
     prompt = f"""
 Use the following context to answer the question. If the context is insufficient, say:
 "Sorry, I don't have enough information to answer that yet."
@@ -78,14 +132,33 @@ Context:
         {"role": "system", "content": "You are a helpful assistant that is made by araaf and answers all the questions smartly,funnyly,clearly and sweetly about rukiya and araaf."},
         {"role": "user", "content": prompt}
     ]
+    return messages
 
-    response = openai.ChatCompletion.create(
+def generate_answer_with_gpt4(question, context, max_tokens=300):
+    messages = build_messages(question, context)
+
+    response = llm_client.chat.completions.create(
         model="gpt-4o-mini",
         messages=messages,
         max_tokens=max_tokens
     )
 
-    return response.choices[0].message['content'].strip()
+    return response.choices[0].message.content.strip()
+
+# ---------------------- Stage Timing ----------------------
+class StageTimer:
+    # Per-request stage durations, reported to clients as a Server-Timing header
+    def __init__(self):
+        self.stages = []
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self.last) * 1000))
+        self.last = now
+
+    def header(self):
+        return ", ".join(f"{stage};dur={ms:.2f}" for stage, ms in self.stages)
 
 # ---------------------- Flask Routes ----------------------
 @app.route("/", methods=["GET", "POST"])
@@ -96,27 +169,115 @@ def chat():
         if not user_question.strip():
             return jsonify({'response': "Please enter a valid question."})
 
+        timer = StageTimer()
         try:
             # 1. Embed user question
-            question_embedding = generate_embeddings(user_question)
+            normalized_question = normalize_question(user_question)
+            question_embedding = cached_embedding(normalized_question)
+            timer.mark('embed')
 
             # 2. Retrieve top documents
-            retrieved_indices = retrieve_documents(question_embedding, k=3)
-            retrieved_articles = [df['Text'][idx] for idx in retrieved_indices]
+            retrieved_indices, scores = search_documents(question_embedding)
+            cache_key = answer_key(normalized_question, retrieved_indices)
+            cached_answer = answer_cache.get(cache_key)
+            timer.mark('search')
+            if cached_answer is not None:
+                response = jsonify({'response': cached_answer})
+                response.headers['Server-Timing'] = timer.header()
+                return response
 
             # 3. Build context string
-            final_context = process_context(retrieved_articles)
+            final_context = build_context(retrieved_indices, scores)
+            timer.mark('context')
 
             # 4. Ask GPT-4 with context
             bot_answer = generate_answer_with_gpt4(user_question, final_context)
+            answer_cache.put(cache_key, bot_answer)
+            timer.mark('llm')
 
-            return jsonify({'response': bot_answer})
+            response = jsonify({'response': bot_answer})
+            response.headers['Server-Timing'] = timer.header()
+            return response
         except Exception as e:
             print("Error:", str(e))
             return jsonify({'response': "Sorry, an error occurred while processing your request."})
 
     return render_template("index.html")
 
+def sse_event(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+@app.route("/stream", methods=["GET", "POST"])
+def chat_stream():
+    # Same pipeline as chat(), but the answer is sent as server-sent events token by token.
+    # GET ?user_message=... works with EventSource; POST works with fetch() streaming.
+    user_question = request.values.get("user_message", "")
+
+    if not user_question.strip():
+        return jsonify({'response': "Please enter a valid question."})
+
+    if not stream_slots.acquire(blocking=False):
+        response = jsonify({'response': "Too many answers are streaming right now. Please try again shortly."})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    try:
+        normalized_question = normalize_question(user_question)
+        question_embedding = cached_embedding(normalized_question)
+        retrieved_indices, scores = search_documents(question_embedding)
+        cache_key = answer_key(normalized_question, retrieved_indices)
+        cached_answer = answer_cache.get(cache_key)
+        if cached_answer is None:
+            messages = build_messages(user_question, build_context(retrieved_indices, scores))
+    except Exception as e:
+        stream_slots.release()
+        print("Error:", str(e))
+        return jsonify({'response': "Sorry, an error occurred while processing your request."})
+
+    def events():
+        if cached_answer is not None:
+            yield sse_event({'token': cached_answer})
+            yield sse_event({}, event="done")
+            return
+        parts = []
+        try:
+            for token in stream_chat(messages):
+                parts.append(token)
+                yield sse_event({'token': token})
+        except Exception as e:
+            print("Error:", str(e))
+            yield sse_event({'response': "Sorry, an error occurred while processing your request."}, event="error")
+            return
+        answer_cache.put(cache_key, "".join(parts).strip())
+        yield sse_event({}, event="done")
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, even if the client left before the first event
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route("/health")
+def health():
+    return jsonify({
+        'status': 'ok',
+        'embedding_backend': embeddings.EMBEDDING_BACKEND,
+        'embedding_ready': embeddings.is_ready()
+    })
+
+@app.route("/cache_stats")
+def cache_stats():
+    return jsonify({
+        'embedding_cache': embedding_cache.stats(),
+        'answer_cache': answer_cache.stats(),
+        'embedding_batcher': embedding_batcher.stats()
+    })
+
 # ---------------------- Run Server ----------------------
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_mb():
+    """
+    (private, file-backed) resident memory in MB. File-backed pages of a memory-mapped
+    store are shared by every worker; private pages are paid per worker.
+    """
+    usage = {'RssAnon:': 0.0, 'RssFile:': 0.0}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in usage:
+                    usage[parts[0]] = int(parts[1]) / 1024
+    except OSError:
+        pass
+    return usage['RssAnon:'], usage['RssFile:']
+
+
+def measure(mode, csv_path, store_dir, lookups):
+    """
+    Runs in a fresh interpreter (nothing heavy imported yet) so import time and
+    resident memory are not shared between the two paths.
+    """
+    anon_before, file_before = rss_mb()
+    start = time.perf_counter()
+    if mode == 'pandas':
+        import pandas as pd
+        df = pd.read_csv(csv_path)
+        n = len(df)
+        fetch = lambda ids: [df['Text'][i] for i in ids]
+    else:
+        from doc_store import DocStore
+        store = DocStore(os.path.join(store_dir, 'article_texts.bin'), os.path.join(store_dir, 'article_offsets.npy'))
+        n = len(store)
+        fetch = store.get_many
+    startup_s = time.perf_counter() - start
+
+    rng = random.Random(0)
+    batches = [[rng.randrange(n) for _ in range(3)] for _ in range(lookups)]
+    start = time.perf_counter()
+    for ids in batches:
+        fetch(ids)
+    lookup_us = (time.perf_counter() - start) / lookups * 1e6
+
+    anon_after, file_after = rss_mb()
+    return {
+        'mode': mode,
+        'rows': n,
+        'startup_s': round(startup_s, 4),
+        'private_rss_growth_mb': round(anon_after - anon_before, 1),
+        'shared_file_rss_growth_mb': round(file_after - file_before, 1),
+        'lookup_3_docs_us': round(lookup_us, 2),
+    }
+
+
+def prepare(rows, workdir):
+    """
+    Replicate CompanionX.csv up to `rows` rows and build a doc store for it.
+    """
+    import pandas as pd
+    from build_index import OFFSETS_FILE, TEXTS_FILE
+    from doc_store import write_doc_store
+    df = pd.read_csv(os.path.join(BASE_DIR, 'CompanionX.csv'))
+    if rows:
+        df = pd.concat([df] * (rows // len(df) + 1), ignore_index=True).iloc[:rows]
+    csv_path = os.path.join(workdir, 'corpus.csv')
+    df.to_csv(csv_path, index=False)
+    texts = df['Text'].fillna('').astype(str).tolist()
+    write_doc_store(texts, os.path.join(workdir, TEXTS_FILE), os.path.join(workdir, OFFSETS_FILE))
+    return csv_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DataFrame vs memory-mapped doc store: startup, memory, lookups")
+    parser.add_argument('--rows', type=int, nargs='+', default=[0, 100_000],
+                        help="corpus sizes (0 = CompanionX.csv as is)")
+    parser.add_argument('--lookups', type=int, default=10_000)
+    parser.add_argument('--measure', choices=['pandas', 'store'], help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    parser.add_argument('--store-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.csv, args.store_dir, args.lookups)))
+        return
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as workdir:
+            csv_path = prepare(rows, workdir)
+            for mode in ('pandas', 'store'):
+                result = subprocess.run(
+                    [sys.executable, __file__, '--measure', mode, '--csv', csv_path,
+                     '--store-dir', workdir, '--lookups', str(args.lookups)],
+                    capture_output=True, text=True, check=True
+                )
+                print(result.stdout.strip(), flush=True)
+
+
+if __name__ == "__main__":
+    main()
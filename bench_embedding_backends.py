@@ -0,0 +1,86 @@
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = ['torch', 'onnx', 'onnx-int8']
+
+
+def load_texts(limit):
+    with open(os.path.join(BASE_DIR, 'CompanionX.csv'), encoding='utf-8', newline='') as f:
+        return [row['Text'] or '' for row in csv.DictReader(f)][:limit]
+
+
+def cold_start(backend):
+    """
+    Runs in a fresh interpreter: time to import, load the model and embed one query.
+    """
+    start = time.perf_counter()
+    import embeddings
+    imported = time.perf_counter()
+    instance = embeddings.create_backend(backend)
+    loaded = time.perf_counter()
+    instance.embed(["How can I manage stress before exams?"])
+    done = time.perf_counter()
+    return {
+        'import_s': round(imported - start, 3),
+        'load_s': round(loaded - imported, 3),
+        'first_query_s': round(done - loaded, 3),
+        'total_s': round(done - start, 3),
+    }
+
+
+def throughput(instance, texts, batch_size, seconds=5.0):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        batch = [texts[(count + i) % len(texts)] for i in range(batch_size)]
+        instance.embed(batch)
+        count += batch_size
+    return round(count / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends: agreement, cold start, queries/sec")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--texts', type=int, default=200, help="knowledge-base rows used for agreement")
+    parser.add_argument('--seconds', type=float, default=5.0, help="duration of each throughput run")
+    parser.add_argument('--cold-start', choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start:
+        print(json.dumps(cold_start(args.cold_start)))
+        return
+
+    import numpy as np
+    import embeddings
+
+    texts = load_texts(args.texts)
+    queries = [text.split('. ')[0] for text in texts]
+    reference = embeddings.create_backend('torch').embed(texts) if 'torch' in args.backends else None
+
+    for backend in args.backends:
+        result = subprocess.run([sys.executable, __file__, '--cold-start', backend],
+                                capture_output=True, text=True, check=True)
+        row = {'backend': backend, 'cold_start': json.loads(result.stdout.strip().splitlines()[-1])}
+
+        instance = embeddings.create_backend(backend)
+        instance.embed(queries[:8])  # warm up
+        row['queries_per_sec_batch_1'] = throughput(instance, queries, 1, args.seconds)
+        row['queries_per_sec_batch_32'] = throughput(instance, queries, 32, args.seconds)
+
+        if reference is not None:
+            vectors = instance.embed(texts)
+            cosine = (vectors * reference).sum(axis=1) / (
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1))
+            row['cosine_vs_torch_mean'] = round(float(cosine.mean()), 5)
+            row['cosine_vs_torch_min'] = round(float(cosine.min()), 5)
+        print(json.dumps(row), flush=True)
+
+
+if __name__ == "__main__":
+    main()
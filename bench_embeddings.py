@@ -0,0 +1,72 @@
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from embeddings import EmbeddingBatcher, embed_texts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_questions(limit=500):
+    # First sentence of each knowledge-base article makes a realistic mix of query lengths
+    with open(os.path.join(BASE_DIR, "CompanionX.csv"), encoding="utf-8", errors="replace") as f:
+        rows = list(csv.DictReader(f))
+    return [row['Text'].split('. ')[0] for row in rows[:limit]]
+
+
+def run_load(embed_one, questions, clients, requests):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(i):
+        start = time.perf_counter()
+        embed_one(questions[i % len(questions)])
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, range(requests)))
+    total = time.perf_counter() - start
+    return {
+        'embeddings_per_sec': round(requests / total, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent query-embedding benchmark")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--wait-ms', type=float, nargs='+', default=[0, 2, 5, 10])
+    args = parser.parse_args()
+
+    questions = load_questions()
+    embed_texts(questions[:8])  # warm up
+
+    results = {'unbatched': run_load(lambda q: embed_texts([q])[0], questions, args.clients, args.requests)}
+    for wait_ms in args.wait_ms:
+        batcher = EmbeddingBatcher(max_batch_size=args.max_batch, max_wait_ms=wait_ms)
+        stats = run_load(batcher.embed, questions, args.clients, args.requests)
+        stats.update(batcher.stats())
+        results[f'batched_wait_{wait_ms:g}ms'] = stats
+
+    # Batched vectors must match embedding each question on its own
+    single = np.stack([embed_texts([q])[0] for q in questions[:16]])
+    batched = embed_texts(questions[:16])
+    results['max_abs_diff_vs_unbatched'] = float(np.abs(single - batched).max())
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from vector_index import INDEX_TYPES, create_index, set_search_params
+
+DIMENSION = 384
+
+
+def synthetic_corpus(n, d=DIMENSION, latent_dim=32, n_clusters=1000, seed=0, chunk=500_000):
+    """
+    Clustered vectors with low intrinsic dimension projected up to d, closer to real
+    sentence embeddings than isotropic noise (where every neighbour is a near-tie).
+    Generated in chunks so multi-million corpora do not need float64 temporaries.
+    Queries should come from the same call as the corpus so they share its clusters.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, latent_dim)).astype(np.float32)
+    projection = rng.standard_normal((latent_dim, d)).astype(np.float32) / np.sqrt(latent_dim)
+    out = np.empty((n, d), dtype=np.float32)
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        labels = rng.integers(0, n_clusters, stop - start)
+        latent = centers[labels] + 0.5 * rng.standard_normal((stop - start, latent_dim), dtype=np.float32)
+        out[start:stop] = latent @ projection + 0.01 * rng.standard_normal((stop - start, d), dtype=np.float32)
+    return out
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def index_file_bytes(index):
+    with tempfile.NamedTemporaryFile(suffix='.faiss', delete=False) as f:
+        path = f.name
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def measure(index, queries, truth, k):
+    latencies = []
+    found = []
+    for q in queries:
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        f'recall@{k}': round(float(recall), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency/memory benchmark for the index types")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--types', nargs='+', choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 64, 128])
+    parser.add_argument('--train-size', type=int, default=200_000)
+    parser.add_argument('--threads', type=int, help="faiss OpenMP threads (default: all cores)")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    results = []
+    for n in args.sizes:
+        data = synthetic_corpus(n + args.queries, seed=n)
+        corpus, queries = data[:n], data[n:]
+        exact = faiss.IndexFlatL2(DIMENSION)
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+        del exact
+
+        for index_type in args.types:
+            before = rss_bytes()
+            start = time.perf_counter()
+            index = create_index(index_type, corpus, train_size=args.train_size)
+            build_s = time.perf_counter() - start
+            base = {
+                'n': n,
+                'index_type': index_type,
+                'build_s': round(build_s, 2),
+                'index_bytes': index_file_bytes(index),
+                'rss_delta_bytes': rss_bytes() - before,
+            }
+
+            if index_type.startswith('ivf'):
+                sweep = [{'nprobe': p} for p in args.nprobe]
+            elif index_type == 'hnsw':
+                sweep = [{'ef_search': ef} for ef in args.ef_search]
+            else:
+                sweep = [{}]
+            for params in sweep:
+                set_search_params(index, **params)
+                row = dict(base, **params, **measure(index, queries, truth, args.k))
+                results.append(row)
+                print(json.dumps(row), flush=True)
+            del index
+        del data, corpus
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
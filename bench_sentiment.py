@@ -0,0 +1,156 @@
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_notes(count, seed=0):
+    """
+    Mood-note stand-ins: knowledge-base text cut to mostly short, occasionally very
+    long lengths, roughly the spread of a real journal backlog.
+    """
+    with open(os.path.join(BASE_DIR, 'CompanionX.csv'), encoding='utf-8', newline='') as f:
+        words = ' '.join(row['Text'] or '' for row in csv.DictReader(f)).split()
+    rng = random.Random(seed)
+    notes = []
+    for _ in range(count):
+        length = min(int(rng.expovariate(1 / 40)) + 3, 1500)
+        start = rng.randrange(len(words))
+        notes.append(' '.join((words[start:] + words)[:length]))
+    return notes
+
+
+def padding_ratio(lengths, batch_size, sort):
+    # Token slots filled with real tokens, when every batch is padded to its longest note
+    if sort:
+        lengths = sorted(lengths)
+    padded = sum(max(lengths[i:i + batch_size]) * len(lengths[i:i + batch_size])
+                 for i in range(0, len(lengths), batch_size))
+    return round(sum(lengths) / padded, 3)
+
+
+def write_path(count, flush_size, seed=0):
+    """
+    Write back mood statuses for `count` synthetic entries (inserted for the run and
+    removed afterwards): the old path, one UPDATE and commit per entry on a pool
+    checkout, against ResultWriter's buffered batches.
+    """
+    import db
+    import sentiment_analysis
+
+    rng = random.Random(seed)
+    statuses = [rng.choice(['happy', 'neutral', 'sad']) for _ in range(count)]
+    with db.connection() as conn:
+        with conn.transaction():
+            before = conn.query_one("SELECT COALESCE(MAX(id), 0) AS last_id FROM mood_entries")['last_id']
+            # Marked analyzed, so a running worker leaves them alone
+            conn.executemany("INSERT INTO mood_entries (user_id, mood_note, analyzed_at) VALUES (%s, %s, %s)",
+                             [(0, 'benchmark', datetime.now())] * count)
+            ids = [row['id'] for row in conn.query(
+                "SELECT id FROM mood_entries WHERE id > %s AND user_id = 0 ORDER BY id", (before,))]
+    entries = [{'id': entry_id, 'user_id': 0, 'mood_note': 'benchmark'} for entry_id in ids]
+    result = {'entries': len(entries), 'flush_size': flush_size}
+    try:
+        start = time.perf_counter()
+        for entry, mood_status in zip(entries, statuses):
+            with db.connection() as conn:
+                conn.execute("UPDATE mood_entries SET mood_status = %s, analyzed_at = %s WHERE id = %s",
+                             (mood_status, datetime.now(), entry['id']))
+        result['per_entry_per_sec'] = round(len(entries) / (time.perf_counter() - start), 1)
+
+        with db.connection() as conn:
+            start = time.perf_counter()
+            writer = sentiment_analysis.ResultWriter(conn, before, flush_size=flush_size,
+                                                     flush_interval=float('inf'), worker='sentiment_bench')
+            for entry, mood_status in zip(entries, statuses):
+                writer.add(entry, mood_status)
+            writer.flush()
+            result['buffered_per_sec'] = round(len(entries) / (time.perf_counter() - start), 1)
+    finally:
+        with db.connection() as conn, conn.transaction():
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                conn.execute(f"DELETE FROM mood_entries WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            conn.execute("DELETE FROM worker_watermarks WHERE worker = %s", ('sentiment_bench',))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentiment worker: inference notes/sec per batch size, sorted vs unsorted, and write-back rate")
+    parser.add_argument('--notes', type=int, default=1000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 16, 32, 64])
+    parser.add_argument('--max-length', type=int, default=None, help="default: SENTIMENT_MAX_LENGTH")
+    parser.add_argument('--per-note', type=int, default=200, help="notes for the old one-call-per-note baseline")
+    parser.add_argument('--backlog', type=int, default=50_000, help="backlog size the minutes estimate is for")
+    parser.add_argument('--writes', type=int, default=0,
+                        help="entries for the write-back comparison; inserts and deletes rows in mood_entries")
+    parser.add_argument('--scratch-db', action='store_true',
+                        help="allow --writes on a MySQL database (only ever point it at a scratch copy)")
+    parser.add_argument('--flush-size', type=int, default=None, help="default: SENTIMENT_FLUSH_SIZE")
+    parser.add_argument('--writes-only', action='store_true', help="skip the inference runs")
+    args = parser.parse_args()
+    if args.writes_only and not args.writes:
+        parser.error("--writes-only needs --writes N")
+    if args.writes and os.getenv('DB_BACKEND', 'mysql') != 'sqlite' and not args.scratch_db:
+        parser.error("--writes changes mood_entries; run it with DB_BACKEND=sqlite or pass --scratch-db")
+
+    import torch
+    import sentiment_analysis
+
+    writes = None
+    if args.writes:
+        sentiment_analysis.modify_mood_entries_table()
+        writes = write_path(args.writes, args.flush_size or sentiment_analysis.SENTIMENT_FLUSH_SIZE)
+    if args.writes_only:
+        print(json.dumps({'writes': writes}, indent=2))
+        return
+
+    max_length = args.max_length or sentiment_analysis.SENTIMENT_MAX_LENGTH
+    notes = load_notes(args.notes)
+    lengths = [len(ids) for ids in sentiment_analysis.sentiment_pipeline.tokenizer(
+        notes, truncation=True, max_length=max_length)['input_ids']]
+    report = {'model': sentiment_analysis.SENTIMENT_MODEL, 'torch_threads': torch.get_num_threads(),
+              'notes': len(notes), 'max_length': max_length,
+              'mean_tokens': round(sum(lengths) / len(lengths), 1), 'runs': []}
+
+    # The old path: one pipeline call per note (truncated as well; untruncated, long notes fail)
+    baseline = notes[:args.per_note]
+    start = time.perf_counter()
+    for note in baseline:
+        sentiment_analysis.sentiment_pipeline(note, truncation=True, max_length=max_length)
+    per_note = len(baseline) / (time.perf_counter() - start)
+    report['per_note_notes_per_sec'] = round(per_note, 1)
+
+    reference = sentiment_analysis.classify_notes(notes, batch_size=1, max_length=max_length)
+    for batch_size in args.batch_sizes:
+        run = {'batch_size': batch_size}
+        for label, sort in (('unsorted', False), ('sorted', True)):
+            start = time.perf_counter()
+            if sort:
+                results = sentiment_analysis.classify_notes(notes, batch_size=batch_size, max_length=max_length)
+            else:
+                results = sentiment_analysis.sentiment_pipeline(notes, batch_size=batch_size,
+                                                                truncation=True, max_length=max_length)
+            rate = len(notes) / (time.perf_counter() - start)
+            run[label] = {'notes_per_sec': round(rate, 1), 'fill': padding_ratio(lengths, batch_size, sort)}
+        run['labels_match'] = [r['label'] for r in results] == [r['label'] for r in reference]
+        run['backlog_minutes'] = round(args.backlog / run['sorted']['notes_per_sec'] / 60, 1)
+        report['runs'].append(run)
+    report['per_note_backlog_minutes'] = round(args.backlog / per_note / 60, 1)
+    if writes:
+        # Share of each note's processing time spent writing it back, at the fastest batch size
+        inference = max(run['sorted']['notes_per_sec'] for run in report['runs'])
+        for key in ('per_entry', 'buffered'):
+            rate = writes[f'{key}_per_sec']
+            writes[f'{key}_share_of_time'] = round((1 / rate) / (1 / rate + 1 / inference), 4)
+        report['writes'] = writes
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
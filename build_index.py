@@ -0,0 +1,146 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+
+import numpy as np
+
+from doc_store import write_doc_store
+from embeddings import MODEL_NAME, embed_texts
+from vector_index import INDEX_TYPES, create_index, write_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Token counts are measured with the chat model's tokenizer so context packing matches the real budget
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+
+# Build artifacts read by app.py
+INDEX_FILE = 'article_index.faiss'
+MANIFEST_FILE = 'article_index.json'
+VECTORS_FILE = 'article_vectors.npy'
+TEXTS_FILE = 'article_texts.bin'
+OFFSETS_FILE = 'article_offsets.npy'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def load_tokenizer():
+    """
+    Return (name, count_fn) for the chat model's tokenizer, or a whitespace count when
+    tiktoken or its encoding files are unavailable.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(LLM_MODEL)
+        return encoding.name, lambda texts: [len(tokens) for tokens in encoding.encode_batch(texts)]
+    except Exception as e:
+        logging.warning(f"tiktoken unavailable for {LLM_MODEL} ({e}); using whitespace token counts")
+        return 'whitespace', lambda texts: [len(text.split()) for text in texts]
+
+
+def load_previous_build(out_dir, tokenizer_name):
+    """
+    Map content hash -> vector and content hash -> token count from the last build so
+    unchanged rows are neither re-embedded nor re-tokenized.
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    vectors_path = os.path.join(out_dir, VECTORS_FILE)
+    if not os.path.exists(manifest_path):
+        return {}, {}
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    vectors = {}
+    if manifest.get('model') != MODEL_NAME:
+        logging.info("Embedding model changed since last build; re-embedding everything")
+    elif os.path.exists(vectors_path):
+        vectors = dict(zip(manifest['hashes'], np.load(vectors_path)))
+
+    token_counts = {}
+    if manifest.get('tokenizer') == tokenizer_name and 'token_counts' in manifest:
+        token_counts = dict(zip(manifest['hashes'], manifest['token_counts']))
+    return vectors, token_counts
+
+
+def seed_from_pickle(pickle_path, hashes):
+    """
+    Reuse the legacy article_embeddings.pkl (one vector per CSV row, in row order).
+    """
+    with open(pickle_path, 'rb') as f:
+        legacy = pickle.load(f)
+    if len(legacy) != len(hashes):
+        logging.warning(f"{pickle_path} has {len(legacy)} vectors for {len(hashes)} rows; not seeding")
+        return {}
+    return {h: np.asarray(v, dtype=np.float32) for h, v in zip(hashes, legacy)}
+
+
+def build(csv_path, out_dir, batch_size=64, seed_pickle=None, index_type='flat', index_params=None,
+          search_params=None):
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        texts = [row['Text'] or '' for row in csv.DictReader(f)]
+    hashes = [content_hash(text) for text in texts]
+
+    tokenizer_name, count_tokens = load_tokenizer()
+    known, known_counts = load_previous_build(out_dir, tokenizer_name)
+    if seed_pickle:
+        known = {**seed_from_pickle(seed_pickle, hashes), **known}
+
+    missing = [i for i, h in enumerate(hashes) if h not in known]
+    logging.info(f"{len(texts)} rows, {len(texts) - len(missing)} unchanged, {len(missing)} to embed")
+
+    if missing:
+        # The model is only loaded (lazily, by embed_texts) when something actually changed
+        start = time.perf_counter()
+        for offset in range(0, len(missing), batch_size):
+            rows = missing[offset:offset + batch_size]
+            for i, vector in zip(rows, embed_texts([texts[i] for i in rows])):
+                known[hashes[i]] = vector.astype(np.float32)
+        logging.info(f"Embedded {len(missing)} rows in {time.perf_counter() - start:.1f}s")
+
+    uncounted = [i for i, h in enumerate(hashes) if h not in known_counts]
+    for i, count in zip(uncounted, count_tokens([texts[i] for i in uncounted])):
+        known_counts[hashes[i]] = count
+
+    vectors = np.stack([known[h] for h in hashes]).astype(np.float32)
+    index = create_index(index_type, vectors, **(index_params or {}))
+
+    manifest = {
+        'model': MODEL_NAME,
+        'dimension': int(vectors.shape[1]),
+        'index_type': index_type,
+        'search_params': {k: v for k, v in (search_params or {}).items() if v},
+        'ids': list(range(len(texts))),
+        'hashes': hashes,
+        'tokenizer': tokenizer_name,
+        'token_counts': [known_counts[h] for h in hashes],
+    }
+    np.save(os.path.join(out_dir, VECTORS_FILE), vectors)
+    write_doc_store(texts, os.path.join(out_dir, TEXTS_FILE), os.path.join(out_dir, OFFSETS_FILE))
+    write_index(index, manifest, os.path.join(out_dir, INDEX_FILE), os.path.join(out_dir, MANIFEST_FILE))
+    logging.info(f"Wrote {index.ntotal} vectors to {os.path.join(out_dir, INDEX_FILE)}")
+    return manifest
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build the FAISS index for the chat knowledge base")
+    parser.add_argument('--csv', default=os.path.join(BASE_DIR, 'CompanionX.csv'))
+    parser.add_argument('--out-dir', default=BASE_DIR)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--seed-from-pickle', metavar='PKL',
+                        help="reuse vectors from a legacy article_embeddings.pkl for unchanged rows")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    parser.add_argument('--nlist', type=int, help="IVF lists (default ~4*sqrt(n))")
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--pq-m', type=int, help="IVF-PQ sub-quantizers (default d/8)")
+    parser.add_argument('--nprobe', type=int, help="default IVF lists probed per query")
+    parser.add_argument('--ef-search', type=int, help="default HNSW search breadth")
+    args = parser.parse_args()
+    build(args.csv, args.out_dir, args.batch_size, args.seed_from_pickle, args.index_type,
+          {'nlist': args.nlist, 'hnsw_m': args.hnsw_m, 'pq_m': args.pq_m},
+          {'nprobe': args.nprobe, 'ef_search': args.ef_search})
@@ -0,0 +1,191 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import db
+
+# Rows per executemany call and user ids per IN (...) lookup; mysql.connector turns
+# each INSERT executemany into one multi-row statement
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+
+# A per-user result table: each user owns a set of item rows (item_column) carrying
+# value_columns. replace=True deletes stored items that are no longer in the new
+# set; replace=False only adds and updates, leaving older rows in place.
+ResultTable = namedtuple('ResultTable', 'table item_column value_columns timestamp_column replace')
+
+CONSULTANT_RECOMMENDATIONS = ResultTable(
+    'ai_consultant_recommendations', 'consultant_id', ['recommendation_score'], 'recommended_at', True)
+EXERCISE_RECOMMENDATIONS = ResultTable(
+    'user_exercise_recommendations', 'exercise_id', [], 'recommended_at', False)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _same(stored, new):
+    # FLOAT columns come back rounded to single precision
+    if isinstance(stored, float) or isinstance(new, float):
+        return stored is not None and new is not None and math.isclose(stored, new, rel_tol=1e-6, abs_tol=1e-9)
+    return stored == new
+
+
+def fetch_stored(conn, spec, user_ids, chunk_size=BULK_CHUNK_SIZE):
+    """
+    {user_id: {item: [values, ...]}} for the users' current rows. An item with
+    more than one stored row is a duplicate left by an older writer.
+    """
+    stored = {}
+    columns = ', '.join(['user_id', spec.item_column, *spec.value_columns])
+    for chunk in _chunks(list(user_ids), chunk_size):
+        rows = conn.query(f"""
+            SELECT {columns}
+            FROM {spec.table}
+            WHERE user_id IN ({', '.join(['%s'] * len(chunk))})
+        """, chunk, dictionary=False)
+        for user_id, item, *values in rows:
+            stored.setdefault(user_id, {}).setdefault(item, []).append(tuple(values))
+    return stored
+
+
+def diff_rows(spec, stored, rows_by_user):
+    """
+    Split the new rows into inserts, updates and deletes against the stored set.
+    Rows whose values have not changed are left alone.
+    """
+    inserts, updates, deletes = [], [], []
+    unchanged = 0
+    for user_id, rows in rows_by_user.items():
+        stored_items = stored.get(user_id, {})
+        seen = set()
+        for item, *values in rows:
+            seen.add(item)
+            current = stored_items.get(item)
+            if current is None:
+                inserts.append((user_id, item, *values))
+            elif len(current) > 1:
+                # Collapse duplicates to one fresh row
+                deletes.append((user_id, item))
+                inserts.append((user_id, item, *values))
+            elif all(_same(old, new) for old, new in zip(current[0], values)):
+                unchanged += 1
+            else:
+                updates.append((user_id, item, *values))
+        if spec.replace:
+            deletes.extend((user_id, item) for item in stored_items if item not in seen)
+    return inserts, updates, deletes, unchanged
+
+
+def write_user_rows(conn, spec, rows_by_user, now=None, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Store each user's result rows ({user_id: [(item, *values), ...]}) in one
+    transaction with one timestamp, touching only rows that changed. Returns counts.
+    """
+    now = now or datetime.now()
+    with conn.transaction():
+        stored = fetch_stored(conn, spec, rows_by_user, chunk_size)
+        inserts, updates, deletes, unchanged = diff_rows(spec, stored, rows_by_user)
+
+        for chunk in _chunks(deletes, chunk_size):
+            conn.executemany(f"DELETE FROM {spec.table} WHERE user_id = %s AND {spec.item_column} = %s", chunk)
+        if updates:
+            assignments = ', '.join(f'{c} = %s' for c in [*spec.value_columns, spec.timestamp_column])
+            sql = f"UPDATE {spec.table} SET {assignments} WHERE user_id = %s AND {spec.item_column} = %s"
+            for chunk in _chunks(updates, chunk_size):
+                conn.executemany(sql, [(*values, now, user_id, item) for user_id, item, *values in chunk])
+        columns = ['user_id', spec.item_column, *spec.value_columns, spec.timestamp_column]
+        sql = f"INSERT INTO {spec.table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        for chunk in _chunks(inserts, chunk_size):
+            conn.executemany(sql, [(*row, now) for row in chunk])
+
+    counts = {'users': len(rows_by_user), 'inserted': len(inserts), 'updated': len(updates),
+              'deleted': len(deletes), 'unchanged': unchanged}
+    logging.debug("Wrote %s: %s", spec.table, counts)
+    return counts
+
+
+# ---------------------- Benchmark ----------------------
+
+def _synthetic_recommendations(user_ids, n_consultants=200, k=5, seed=0):
+    rng = random.Random(seed)
+    return {user_id: [(consultant_id, round(rng.random(), 4))
+                      for consultant_id in rng.sample(range(1, n_consultants + 1), k)]
+            for user_id in user_ids}
+
+
+def _write_row_by_row(conn, rows_by_user, now):
+    # The old path: per user, a DELETE and one INSERT execute per row
+    for user_id, rows in rows_by_user.items():
+        with conn.transaction():
+            conn.execute("DELETE FROM ai_consultant_recommendations WHERE user_id = %s", (user_id,))
+            for consultant_id, score in rows:
+                conn.execute("""
+                    INSERT INTO ai_consultant_recommendations (user_id, consultant_id, recommendation_score, recommended_at)
+                    VALUES (%s, %s, %s, %s)
+                """, (user_id, consultant_id, score, now))
+
+
+def _clear(conn, user_ids, chunk_size):
+    with conn.transaction():
+        for chunk in _chunks(user_ids, chunk_size):
+            conn.execute(f"DELETE FROM ai_consultant_recommendations WHERE user_id IN ({', '.join(['%s'] * len(chunk))})",
+                         chunk)
+
+
+def benchmark(sizes, base_user_id=900_000_000, changed=0.1, row_by_row_max=10_000, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Write top-5 consultant recommendations for synthetic users (ids from base_user_id,
+    removed again afterwards): the old row-by-row path, a first bulk write, a bulk
+    rewrite where `changed` of the users have new results, and an unchanged rewrite.
+    """
+    results = []
+    with db.connection() as conn:
+        for n in sizes:
+            user_ids = list(range(base_user_id, base_user_id + n))
+            first = _synthetic_recommendations(user_ids)
+            rerun = dict(first)
+            rerun.update(_synthetic_recommendations(user_ids[:int(n * changed)], seed=1))
+            result = {'users': n, 'rows': 5 * n}
+            try:
+                if n <= row_by_row_max:
+                    start = time.perf_counter()
+                    _write_row_by_row(conn, first, datetime.now())
+                    result['row_by_row_users_per_sec'] = round(n / (time.perf_counter() - start))
+                    _clear(conn, user_ids, chunk_size)
+                for label, rows_by_user in (('bulk_first', first), (f'bulk_{changed:.0%}_changed', rerun),
+                                            ('bulk_unchanged', rerun)):
+                    start = time.perf_counter()
+                    counts = write_user_rows(conn, CONSULTANT_RECOMMENDATIONS, rows_by_user, chunk_size=chunk_size)
+                    elapsed = time.perf_counter() - start
+                    result[label] = {'users_per_sec': round(n / elapsed), 'seconds': round(elapsed, 3),
+                                     **{key: counts[key] for key in ('inserted', 'updated', 'deleted', 'unchanged')}}
+            finally:
+                _clear(conn, user_ids, chunk_size)
+            logging.info(f"Benchmarked bulk writes for {n} users")
+            results.append(result)
+    return {'backend': conn.dialect, 'chunk_size': chunk_size, 'results': results}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Bulk writer for per-user recommendation tables")
+    parser.add_argument('command', choices=['bench'])
+    parser.add_argument('--users', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument('--row-by-row-max', type=int, default=10_000,
+                        help="skip the slow row-by-row baseline above this many users")
+    parser.add_argument('--scratch-db', action='store_true',
+                        help="allow the benchmark on a MySQL database (only ever point it at a scratch copy)")
+    args = parser.parse_args()
+    if db.DB_BACKEND != 'sqlite' and not args.scratch_db:
+        parser.error("bench writes to ai_consultant_recommendations; run it with DB_BACKEND=sqlite or pass --scratch-db")
+
+    print(json.dumps(benchmark(args.users, row_by_row_max=args.row_by_row_max, chunk_size=args.chunk_size),
+                     indent=2))
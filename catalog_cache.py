@@ -0,0 +1,153 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import db
+
+# A catalog is reloaded when its version fingerprint changes (checked at most every
+# CATALOG_CHECK_INTERVAL seconds) and unconditionally after CATALOG_TTL seconds
+CATALOG_TTL = float(os.getenv('CATALOG_TTL', '600'))
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', '30'))
+
+
+class Catalog:
+    """
+    In-memory copy of a small, rarely changing table, optionally indexed by one column.
+    Rows are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, name, load_query, version_query, index_by=None, prepare=None,
+                 ttl=CATALOG_TTL, check_interval=CATALOG_CHECK_INTERVAL, connect=db.connection):
+        self.name = name
+        self.load_query = load_query
+        self.version_query = version_query
+        self.index_by = index_by
+        self.prepare = prepare
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.connect = connect
+        self.rows = None
+        self.index = {}
+        self.version = None
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.loads = 0
+        # Called as listener(old_rows, new_rows) when a reload replaces loaded rows
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def _fetch_version(self, conn):
+        query = self.version_query
+        if isinstance(query, dict):
+            query = query[conn.dialect]
+        return tuple(str(value) for value in conn.query_one(query, dictionary=False))
+
+    def _load(self, conn, version=None):
+        rows = conn.query(self.load_query)
+        if self.prepare:
+            rows = [self.prepare(row) for row in rows]
+        index = {}
+        if self.index_by:
+            for row in rows:
+                index.setdefault(row[self.index_by], []).append(row)
+        # Swap in complete structures so readers never see a half-built catalog
+        old_rows = self.rows
+        self.rows, self.index = rows, index
+        self.version = version
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.loads += 1
+        logging.info(f"Loaded {len(rows)} rows into the {self.name} catalog")
+        if old_rows is not None:
+            for listener in self.listeners:
+                try:
+                    listener(old_rows, rows)
+                except Exception as e:
+                    logging.error(f"{self.name} reload listener failed: {e}")
+
+    def _is_fresh(self, now):
+        return self.rows is not None and now - self.checked_at < self.check_interval \
+            and now - self.loaded_at < self.ttl
+
+    def refresh(self, force=False):
+        if not force and self._is_fresh(time.monotonic()):
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not force and self._is_fresh(now):
+                return
+            try:
+                with self.connect() as conn:
+                    version = self._fetch_version(conn)
+                    if force or self.rows is None or version != self.version or now - self.loaded_at >= self.ttl:
+                        self._load(conn, version)
+                    else:
+                        self.checked_at = now
+            except Exception as e:
+                if self.rows is None:
+                    raise
+                logging.error(f"Keeping stale {self.name} catalog after refresh error: {e}")
+                self.checked_at = now
+
+    def all(self):
+        self.refresh()
+        return self.rows
+
+    def get(self, key):
+        self.refresh()
+        return self.index.get(key, [])
+
+    def sample(self, key, k):
+        """
+        Up to k distinct random rows for key, replacing ORDER BY RAND() LIMIT k.
+        """
+        rows = self.get(key)
+        return random.sample(rows, min(k, len(rows)))
+
+    def stats(self):
+        return {
+            'rows': len(self.rows) if self.rows is not None else None,
+            'loads': self.loads,
+            'age_s': round(time.monotonic() - self.loaded_at, 1) if self.rows is not None else None,
+        }
+
+
+def _default_icon(task):
+    # Ensure valid Font Awesome icons
+    task['icon'] = task['icon'] or 'fas fa-lightbulb'
+    return task
+
+
+mood_tasks = Catalog(
+    'mood_tasks',
+    "SELECT mood, task_type, description, icon FROM mood_tasks",
+    # mood_tasks has no updated_at column; CHECKSUM TABLE is cheap at this size
+    {'mysql': "CHECKSUM TABLE mood_tasks", 'sqlite': "SELECT COUNT(*), MAX(id) FROM mood_tasks"},
+    index_by='mood',
+    prepare=_default_icon,
+)
+
+exercises = Catalog(
+    'mental_exercises',
+    "SELECT id, title, description, category FROM mental_exercises",
+    "SELECT COUNT(*), MAX(id), MAX(updated_at) FROM mental_exercises",
+    index_by='category',
+)
+
+consultants = Catalog(
+    'consultants',
+    """
+        SELECT id, specialization, tags
+        FROM consultants
+        WHERE status = 'active' AND is_available = 1
+    """,
+    # updated_at changes with status / is_available (ON UPDATE CURRENT_TIMESTAMP)
+    "SELECT COUNT(*), MAX(id), MAX(updated_at) FROM consultants",
+)
+
+CATALOGS = [mood_tasks, exercises, consultants]
+
+
+def stats():
+    return {catalog.name: catalog.stats() for catalog in CATALOGS}
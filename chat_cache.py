@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache sizing (entries) and answer lifetime (seconds)
+EMBED_CACHE_SIZE = int(os.getenv('CHAT_EMBED_CACHE_SIZE', '1024'))
+ANSWER_CACHE_SIZE = int(os.getenv('CHAT_ANSWER_CACHE_SIZE', '512'))
+ANSWER_CACHE_TTL = float(os.getenv('CHAT_ANSWER_CACHE_TTL', '3600'))
+# Set to a file path to share answers between workers through SQLite
+ANSWER_CACHE_DB = os.getenv('CHAT_ANSWER_CACHE_DB')
+
+
+def normalize_question(text):
+    """
+    Case, whitespace and trailing punctuation do not change what is being asked.
+    """
+    return re.sub(r'\s+', ' ', text).strip().lower().rstrip('?!. ')
+
+
+def answer_key(question, doc_ids):
+    return f"{question}|{','.join(str(int(i)) for i in doc_ids)}"
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU map with hit/miss/eviction counters.
+    Entries optionally expire `ttl` seconds after they were stored.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'backend': 'memory',
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class SQLiteCache:
+    """
+    Answer cache stored in a SQLite file so several workers reuse each other's entries.
+    Values must be JSON-serializable. Counters are per process.
+    """
+
+    def __init__(self, path, maxsize, ttl):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_last_used ON answer_cache (last_used)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def _count(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM answer_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(misses=1)
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+            conn.commit()
+            self._count(misses=1, expirations=1)
+            return None
+        conn.execute("UPDATE answer_cache SET last_used = ? WHERE key = ?", (now, key))
+        conn.commit()
+        self._count(hits=1)
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO answer_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl, now)
+        )
+        # Drop expired entries first, then the least recently used beyond maxsize
+        expired = conn.execute("DELETE FROM answer_cache WHERE expires_at <= ?", (now,)).rowcount
+        evicted = conn.execute("""
+            DELETE FROM answer_cache WHERE key IN (
+                SELECT key FROM answer_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.maxsize,)).rowcount
+        conn.commit()
+        self._count(expirations=expired, evictions=evicted)
+
+    def stats(self):
+        size = self._conn().execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+        with self.lock:
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'size': size,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def create_caches():
+    """
+    Build the (embedding cache, answer cache) pair from the environment settings.
+    """
+    embedding_cache = LRUCache(EMBED_CACHE_SIZE)
+    if ANSWER_CACHE_DB:
+        answer_cache = SQLiteCache(ANSWER_CACHE_DB, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+    else:
+        answer_cache = LRUCache(ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+    return embedding_cache, answer_cache
@@ -2,6 +2,7 @@
 <?php
 session_start();
 include 'config/db.php';
+include 'includes/analytics.php';
 
 $user_id = $_SESSION['user_id'] ?? null;
 if (!$user_id) {
@@ -13,7 +14,7 @@ if (!$user_id) {
 $pythonPath = "\"C:/Users/laptop universe/AppData/Local/Programs/Python/Python311/python.exe\"";
 $scriptPath = "\"C:/xampp/htdocs/Companion/recommend_exercises.py\"";
 $pythonScript = "$pythonPath $scriptPath " . escapeshellarg($user_id);
-$output = shell_exec($pythonScript . " 2>&1");
+$output = runAnalytics('recommend_exercises', $user_id, $pythonScript);
 $recommended_exercises = $output ? json_decode($output, true) : [];
 
 // Fetch all exercises for fallback
@@ -11,6 +11,16 @@ CREATE TABLE admin (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- AI CONSULTANT RECOMMENDATIONS (written by recommend_consultants.py)
+CREATE TABLE ai_consultant_recommendations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    consultant_id INT,
+    recommendation_score FLOAT,
+    recommended_at DATETIME,
+    INDEX idx_ai_consultant_recommendations_user (user_id, consultant_id)
+);
+
 -- ANNOUNCEMENTS TABLE
 CREATE TABLE announcements (
     announcement_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -177,6 +187,17 @@ CREATE TABLE doctor_journals (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- EXERCISE RECOMMENDATION CACHE (change tracking for recommend_excercises.py)
+CREATE TABLE exercise_recommendation_cache (
+    user_id INT PRIMARY KEY,
+    inputs_hash CHAR(40),
+    signals_json TEXT,
+    threshold DOUBLE,
+    deps_json TEXT,
+    result_json TEXT,
+    computed_at DATETIME
+);
+
 -- MENTAL EXERCISES
 CREATE TABLE mental_exercises (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -204,6 +225,18 @@ CREATE TABLE mood_journal (
 
 -- MOOD ENTRIES (optional duplicate structure)
 CREATE TABLE mood_entries LIKE mood_journal;
+-- Written by sentiment_analysis.py; (analyzed_at, id) finds entries still unanalyzed below its watermark
+ALTER TABLE mood_entries
+    ADD COLUMN mood_status VARCHAR(20) DEFAULT NULL,
+    ADD COLUMN analyzed_at DATETIME DEFAULT NULL,
+    ADD INDEX idx_mood_entries_analyzed (analyzed_at, id);
+
+-- WORKER WATERMARKS (last entry id processed by a polling worker, e.g. sentiment_analysis.py)
+CREATE TABLE worker_watermarks (
+    worker VARCHAR(64) PRIMARY KEY,
+    last_id INT NOT NULL DEFAULT 0,
+    updated_at DATETIME
+);
 
 -- MOOD LOGS
 CREATE TABLE mood_logs (
@@ -214,6 +247,18 @@ CREATE TABLE mood_logs (
     created_at DATETIME
 );
 
+-- MOOD PREDICTION CACHE (written by predict_mood.py and the predict_mood_batch.py job)
+CREATE TABLE mood_prediction_cache (
+    user_id INT PRIMARY KEY,
+    mood VARCHAR(20),
+    stability INT,
+    message VARCHAR(255),
+    -- With entry_count, identifies the entries the prediction was made from
+    entry_count INT,
+    last_entry_id INT,
+    computed_at DATETIME
+);
+
 -- NOTIFICATIONS
 CREATE TABLE notifications (
     notification_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -333,7 +378,8 @@ CREATE TABLE user_exercise_recommendations (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT,
     exercise_id INT,
-    recommended_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    recommended_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uniq_user_exercise (user_id, exercise_id)
 );
 
 -- USER INTENT REASONS
@@ -363,6 +409,18 @@ CREATE TABLE user_moods (
     recorded_at DATETIME
 );
 
+-- USER MOOD ENTRIES
+CREATE TABLE user_mood_entries (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT,
+    mood ENUM('Happy', 'Sad', 'Neutral', 'Angry', 'Excited'),
+    intensity INT,
+    notes TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    -- Newest-first per-user window scans (mood_state.py, predict_mood_batch.py)
+    INDEX idx_user_mood_entries_user_created (user_id, created_at, id)
+);
+
 -- USER MOOD LOG
 CREATE TABLE user_mood_log (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -371,6 +429,20 @@ CREATE TABLE user_mood_log (
     created_at DATETIME
 );
 
+-- USER MOOD STATE (rolling last-14 window per user, maintained by mood_state.py)
+CREATE TABLE user_mood_state (
+    user_id INT PRIMARY KEY,
+    entry_count INT NOT NULL DEFAULT 0,
+    last_entry_id INT NOT NULL DEFAULT 0,
+    intensity_sum INT NOT NULL DEFAULT 0,
+    weekday_score_sum INT NOT NULL DEFAULT 0,
+    weekday_count INT NOT NULL DEFAULT 0,
+    weekend_score_sum INT NOT NULL DEFAULT 0,
+    weekend_count INT NOT NULL DEFAULT 0,
+    window_json TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- USER PROGRESS
 CREATE TABLE user_progress (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -0,0 +1,301 @@
+import argparse
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Connection settings for the analytics scripts. DB_BACKEND=sqlite runs the whole
+# stack against a local file (create it with `python db.py init-sqlite`).
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+DB_HOST = os.getenv('DB_HOST', '127.0.0.1')
+DB_PORT = int(os.getenv('DB_PORT', '3306'))
+DB_USER = os.getenv('DB_USER', 'root')
+DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+DB_NAME = os.getenv('DB_NAME', 'companionx')
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', os.path.join(BASE_DIR, 'companionx.sqlite3'))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+SQLITE_SCHEMA = os.path.join(BASE_DIR, 'sqlite_schema.sql')
+
+# SQLite hands DATETIME columns back as datetime objects, like mysql.connector does
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+
+class Connection:
+    """
+    A pooled connection. SQL is written once with %s placeholders and runs on
+    either backend; parameters are bound client-side, so a statement costs one
+    round trip on MySQL. Connections are in autocommit mode outside transaction().
+    """
+
+    def __init__(self, raw, dialect):
+        self.raw = raw
+        self.dialect = dialect
+        self.in_transaction = False
+
+    def _sql(self, sql):
+        return sql.replace('%s', '?') if self.dialect == 'sqlite' else sql
+
+    def _cursor(self):
+        # Not prepared=True: a one-shot server-side statement adds a PREPARE and a
+        # DEALLOCATE round trip and is never reused
+        return self.raw.cursor()
+
+    def query(self, sql, params=(), dictionary=True):
+        cursor = self._cursor()
+        try:
+            cursor.execute(self._sql(sql), tuple(params))
+            rows = cursor.fetchall()
+            if not dictionary:
+                return [tuple(row) for row in rows]
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in rows]
+        finally:
+            cursor.close()
+
+    def query_one(self, sql, params=(), dictionary=True):
+        rows = self.query(sql, params, dictionary)
+        return rows[0] if rows else None
+
+    def execute(self, sql, params=()):
+        cursor = self._cursor()
+        try:
+            cursor.execute(self._sql(sql), tuple(params))
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def executemany(self, sql, seq_of_params):
+        # Plain cursor: mysql.connector rewrites INSERT ... VALUES into one multi-row statement
+        seq_of_params = [tuple(p) for p in seq_of_params]
+        if not seq_of_params:
+            return 0
+        cursor = self._cursor()
+        try:
+            cursor.executemany(self._sql(sql), seq_of_params)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def upsert(self, table, columns, key_columns, rows, update_columns=None):
+        """
+        Insert rows, updating update_columns (default: every non-key column) where
+        key_columns already exist. key_columns must be a primary or unique key.
+        """
+        update_columns = update_columns or [c for c in columns if c not in key_columns]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        if self.dialect == 'mysql':
+            sql += f" ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in update_columns)}"
+        else:
+            sql += (f" ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+                    f"{', '.join(f'{c} = excluded.{c}' for c in update_columns)}")
+        return self.executemany(sql, rows)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Commit on success, roll back on error. Nested scopes join the outer one.
+        """
+        if self.in_transaction:
+            yield self
+            return
+        if self.dialect == 'mysql':
+            self.raw.start_transaction()
+        else:
+            self.raw.execute('BEGIN')
+        self.in_transaction = True
+        try:
+            yield self
+            self.raw.commit()
+        except BaseException:
+            self.raw.rollback()
+            raise
+        finally:
+            self.in_transaction = False
+
+
+def _connect_mysql():
+    import mysql.connector
+    raw = mysql.connector.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        autocommit=True
+    )
+    return Connection(raw, 'mysql')
+
+
+def _connect_sqlite():
+    raw = sqlite3.connect(DB_SQLITE_PATH, detect_types=sqlite3.PARSE_DECLTYPES,
+                          isolation_level=None, check_same_thread=False, timeout=DB_POOL_TIMEOUT)
+    raw.execute('PRAGMA journal_mode=WAL')
+    return Connection(raw, 'sqlite')
+
+
+class Pool:
+    """
+    Fixed-size pool of open connections. acquire() blocks up to timeout seconds when
+    all connections are in use; dropped MySQL connections are replaced on checkout.
+    """
+
+    def __init__(self, backend=DB_BACKEND, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        if backend not in ('mysql', 'sqlite'):
+            raise ValueError(f"Unknown DB_BACKEND {backend!r}; expected mysql or sqlite")
+        self.connect = _connect_mysql if backend == 'mysql' else _connect_sqlite
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.checkouts = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self.lock:
+                if self.created < self.size:
+                    self.created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+                logging.info(f"Opened {conn.dialect} connection {self.created}/{self.size}")
+            else:
+                try:
+                    conn = self.idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No database connection free after {self.timeout}s")
+        if conn.dialect == 'mysql' and not conn.raw.is_connected():
+            try:
+                conn.raw.reconnect(attempts=2, delay=0.1)
+            except Exception:
+                # Give the slot back, so the pool can open a fresh connection once the server is up
+                self.discard(conn)
+                raise
+        with self.lock:
+            self.checkouts += 1
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.raw.rollback()
+            conn.in_transaction = False
+        self.idle.put(conn)
+
+    def discard(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.created -= 1
+
+    def stats(self):
+        return {'size': self.size, 'open': self.created, 'idle': self.idle.qsize(), 'checkouts': self.checkouts}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = Pool()
+    return _pool
+
+
+@contextmanager
+def connection():
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    except Exception as e:
+        # A broken connection is dropped rather than handed to the next caller
+        if _is_connection_error(e):
+            pool.discard(conn)
+            conn = None
+        raise
+    finally:
+        if conn is not None:
+            pool.release(conn)
+
+
+@contextmanager
+def transaction():
+    with connection() as conn, conn.transaction():
+        yield conn
+
+
+def _is_connection_error(error):
+    try:
+        import mysql.connector
+        return isinstance(error, (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError))
+    except ImportError:
+        return False
+
+
+def init_sqlite(path=DB_SQLITE_PATH):
+    with open(SQLITE_SCHEMA, encoding='utf-8') as f:
+        schema = f.read()
+    raw = sqlite3.connect(path)
+    try:
+        raw.executescript(schema)
+    finally:
+        raw.close()
+    logging.info(f"Created SQLite database {path}")
+
+
+def bench_connections(n=200):
+    """
+    Time n pooled checkouts against n fresh connections (one handshake each).
+    """
+    pool = get_pool()
+    with connection() as conn:
+        conn.query("SELECT 1")
+    start = time.perf_counter()
+    for _ in range(n):
+        with connection() as conn:
+            conn.query("SELECT 1")
+    pooled_ms = (time.perf_counter() - start) / n * 1000
+    start = time.perf_counter()
+    for _ in range(n):
+        conn = pool.connect()
+        conn.query("SELECT 1")
+        conn.raw.close()
+    fresh_ms = (time.perf_counter() - start) / n * 1000
+    return {'backend': DB_BACKEND, 'pooled_ms': round(pooled_ms, 3), 'fresh_connection_ms': round(fresh_ms, 3)}
+
+
+if __name__ == "__main__":
+    import json
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Analytics database helpers")
+    parser.add_argument('command', choices=['init-sqlite', 'bench'])
+    parser.add_argument('--path', default=DB_SQLITE_PATH, help="SQLite file for init-sqlite")
+    args = parser.parse_args()
+
+    if args.command == 'init-sqlite':
+        init_sqlite(args.path)
+    else:
+        print(json.dumps(bench_connections()))
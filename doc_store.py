@@ -0,0 +1,50 @@
+import mmap
+import os
+
+import numpy as np
+
+
+def write_doc_store(texts, blob_path, offsets_path):
+    """
+    Write texts as one contiguous UTF-8 blob plus an int64 offsets array (n + 1 entries),
+    so text i is blob[offsets[i]:offsets[i + 1]]. Files are replaced atomically.
+    """
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(blob_path + '.tmp', 'wb') as f:
+        for b in encoded:
+            f.write(b)
+    with open(offsets_path + '.tmp', 'wb') as f:
+        np.save(f, offsets)
+    os.replace(blob_path + '.tmp', blob_path)
+    os.replace(offsets_path + '.tmp', offsets_path)
+
+
+class DocStore:
+    """
+    Read-only, memory-mapped view of a store written by write_doc_store. Pages are
+    shared between worker processes and only the requested texts are ever decoded.
+    """
+
+    def __init__(self, blob_path, offsets_path):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        with open(blob_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap cannot map an empty file
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.view = memoryview(self.blob)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, doc_id):
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        # Decoding straight from the memoryview avoids an intermediate bytes copy
+        return str(self.view[start:end], 'utf-8')
+
+    def get_many(self, doc_ids):
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        starts = self.offsets[doc_ids]
+        ends = self.offsets[doc_ids + 1]
+        return [str(self.view[start:end], 'utf-8') for start, end in zip(starts, ends)]
@@ -0,0 +1,193 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_LENGTH = 512
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Embedding backend: 'torch' (eager PyTorch), 'onnx' (fp32 export) or 'onnx-int8'
+# (dynamically quantized export). Create the ONNX files once with export_onnx.py.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('EMBEDDING_ONNX_DIR', os.path.join(BASE_DIR, 'onnx_model'))
+ONNX_FILES = {'onnx': 'model.onnx', 'onnx-int8': 'model_int8.onnx'}
+
+# Micro-batching settings for concurrent chat requests
+BATCH_MAX_SIZE = int(os.getenv('EMBED_BATCH_MAX_SIZE', '32'))
+BATCH_WAIT_MS = float(os.getenv('EMBED_BATCH_WAIT_MS', '5'))
+
+
+def mean_pool(hidden, mask):
+    # Padding-aware mean so each row matches embedding that text on its own
+    mask = mask[..., None].astype(hidden.dtype)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1, None)
+
+
+class TorchBackend:
+    name = 'torch'
+
+    def __init__(self):
+        # Heavy imports happen here, not at module import time
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+        self.torch = torch
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.model = AutoModel.from_pretrained(MODEL_NAME).to(self.device)
+        self.model.eval()
+
+    def embed(self, texts, max_length=MAX_LENGTH):
+        inputs = self.tokenizer(
+            list(texts),
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=max_length
+        ).to(self.device)
+
+        with self.torch.no_grad():
+            outputs = self.model(**inputs)
+        return mean_pool(outputs.last_hidden_state.cpu().numpy(), inputs['attention_mask'].cpu().numpy())
+
+
+class OnnxBackend:
+    """
+    Runs the exported model with onnxruntime and the standalone `tokenizers` library,
+    so neither torch nor transformers is imported.
+    """
+
+    def __init__(self, variant='onnx', model_dir=ONNX_MODEL_DIR):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        self.name = variant
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_padding(pad_id=0, pad_token='[PAD]')
+        self.tokenizer.enable_truncation(max_length=MAX_LENGTH)
+        self.max_length = MAX_LENGTH
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_FILES[variant]), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def embed(self, texts, max_length=MAX_LENGTH):
+        if max_length != self.max_length:
+            self.tokenizer.enable_truncation(max_length=max_length)
+            self.max_length = max_length
+        encodings = self.tokenizer.encode_batch(list(texts))
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        return mean_pool(hidden, feeds['attention_mask'])
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=EMBEDDING_BACKEND):
+    if name == 'torch':
+        return TorchBackend()
+    if name in ONNX_FILES:
+        return OnnxBackend(name)
+    raise ValueError(f"Unknown embedding backend {name!r}; expected torch, onnx or onnx-int8")
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                start = time.perf_counter()
+                _backend = create_backend()
+                logging.info(f"Loaded {_backend.name} embedding backend in {time.perf_counter() - start:.2f}s")
+    return _backend
+
+
+def is_ready():
+    return _backend is not None
+
+
+def warm_up():
+    """
+    Load the backend on a background thread so the process can answer health checks
+    while the model is still loading.
+    """
+    threading.Thread(target=get_backend, name="embedding-warm-up", daemon=True).start()
+
+
+def embed_texts(texts, max_length=MAX_LENGTH):
+    """
+    Embed a list of texts in one padded forward pass with the configured backend.
+    """
+    return get_backend().embed(texts, max_length)
+
+
+class EmbeddingBatcher:
+    """
+    Collects texts submitted from concurrent request threads and embeds them together.
+    A batch is flushed when it reaches max_batch_size or max_wait_ms after its first text.
+    """
+
+    def __init__(self, embed_fn=embed_texts, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WAIT_MS):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.worker.start()
+
+    def embed(self, text):
+        future = Future()
+        self.pending.put((text, future))
+        return future.result()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0,
+        }
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed: still take anything already queued
+                    batch.append(self.pending.get_nowait())
+                else:
+                    batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                vectors = self.embed_fn([text for text, _ in batch])
+            except Exception as e:
+                logging.error(f"Embedding batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -0,0 +1,58 @@
+import argparse
+import logging
+import os
+
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from embeddings import MODEL_NAME, ONNX_FILES, ONNX_MODEL_DIR
+
+
+class LastHiddenState(torch.nn.Module):
+    # Export only the token embeddings; pooling is done by the caller with the attention mask
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                          token_type_ids=token_type_ids).last_hidden_state
+
+
+def export(out_dir=ONNX_MODEL_DIR, quantize=True):
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModel.from_pretrained(MODEL_NAME).eval()
+    # Writes tokenizer.json for the lightweight `tokenizers` runtime
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["a sample sentence", "another one"], return_tensors="pt", padding=True)
+    fp32_path = os.path.join(out_dir, ONNX_FILES['onnx'])
+    dynamic = {0: 'batch', 1: 'sequence'}
+    torch.onnx.export(
+        LastHiddenState(model),
+        (sample['input_ids'], sample['attention_mask'], sample['token_type_ids']),
+        fp32_path,
+        input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+        output_names=['last_hidden_state'],
+        dynamic_axes={'input_ids': dynamic, 'attention_mask': dynamic, 'token_type_ids': dynamic,
+                      'last_hidden_state': dynamic},
+        opset_version=17,
+        dynamo=False
+    )
+    logging.info(f"Exported {MODEL_NAME} to {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(out_dir, ONNX_FILES['onnx-int8'])
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        logging.info(f"Wrote dynamically quantized int8 model to {int8_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export the MiniLM embedding model to ONNX")
+    parser.add_argument('--out-dir', default=ONNX_MODEL_DIR)
+    parser.add_argument('--no-quantize', action='store_true', help="skip the int8 model")
+    args = parser.parse_args()
+    export(args.out_dir, quantize=not args.no_quantize)
@@ -0,0 +1,128 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the OpenAI chat-completions endpoint so the chat route can be exercised
+# offline. Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+
+CANNED_ANSWER = (
+    "Taking a few slow breaths, naming what you feel and reaching out to someone you trust "
+    "can make a hard moment lighter. If the feeling keeps coming back, booking a session "
+    "with one of our consultants is a good next step."
+)
+
+
+class FakeCompletionHandler(BaseHTTPRequestHandler):
+    # Set per server by start_fake_server()
+    latency_s = 0.2
+    tokens_per_sec = 50.0
+    answer = CANNED_ANSWER
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        tokens = [word + ' ' for word in self.answer.split(' ')]
+        max_tokens = body.get('max_tokens')
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+        model = body.get('model', 'fake-model')
+
+        time.sleep(self.latency_s)
+        if body.get('stream'):
+            self.stream(tokens, model)
+        else:
+            time.sleep(len(tokens) / self.tokens_per_sec)
+            self.send_json(self.completion(''.join(tokens).strip(), model, len(tokens)))
+
+    def completion(self, content, model, n_tokens):
+        return {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': n_tokens, 'total_tokens': n_tokens},
+        }
+
+    def chunk(self, model, delta, finish_reason=None):
+        return {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+
+    def stream(self, tokens, model):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+        interval = 1 / self.tokens_per_sec
+        try:
+            self.write_event(self.chunk(model, {'role': 'assistant', 'content': ''}))
+            for token in tokens:
+                self.write_event(self.chunk(model, {'content': token}))
+                time.sleep(interval)
+            self.write_event(self.chunk(model, {}, 'stop'))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def write_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(host='127.0.0.1', port=0, latency_ms=200, tokens_per_sec=50.0, answer=CANNED_ANSWER):
+    """
+    Start the fake completion server on a background thread and return it.
+    Use port=0 to pick a free port (server.server_address[1]).
+    """
+    handler = type('ConfiguredFakeCompletionHandler', (FakeCompletionHandler,), {
+        'latency_s': latency_ms / 1000,
+        'tokens_per_sec': tokens_per_sec,
+        'answer': answer,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake OpenAI chat-completions server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--latency-ms', type=float, default=200, help="delay before the first token")
+    parser.add_argument('--tokens-per-sec', type=float, default=50)
+    args = parser.parse_args()
+    server = start_fake_server(args.host, args.port, args.latency_ms, args.tokens_per_sec)
+    print(f"Fake completion server on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,16 @@
+<?php
+// Warm analytics daemon (analytics_server.py); pages fall back to spawning the script if it is down
+define('ANALYTICS_HOST', getenv('ANALYTICS_HOST') ?: '127.0.0.1');
+define('ANALYTICS_PORT', getenv('ANALYTICS_PORT') ?: '8765');
+
+function runAnalytics($method, $userId, $fallbackCommand) {
+    $url = sprintf('http://%s:%s/%s?user_id=%d', ANALYTICS_HOST, ANALYTICS_PORT, $method, (int)$userId);
+    $context = stream_context_create(['http' => ['timeout' => 30, 'ignore_errors' => true]]);
+    $output = @file_get_contents($url, false, $context);
+    if ($output !== false && isset($http_response_header[0]) && strpos($http_response_header[0], ' 200 ') !== false) {
+        return $output;
+    }
+    error_log("Analytics daemon unavailable for $method, spawning script for user_id: $userId");
+    return shell_exec($fallbackCommand . " 2>&1");
+}
+?>
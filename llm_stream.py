@@ -0,0 +1,68 @@
+import asyncio
+import os
+import queue
+import threading
+
+from openai import AsyncOpenAI
+
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+
+# All streaming completions share one event loop thread and one async client, so the
+# upstream HTTP I/O for every in-flight conversation is multiplexed on the loop. The
+# Flask worker thread serving a /stream response still blocks relaying its tokens
+# for the whole completion: size the server's threads for concurrent streams (see
+# STREAM_MAX_CONCURRENT in app.py and the README).
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+_DONE = object()
+
+
+def _ensure_loop():
+    global _loop, _client
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-stream-loop", daemon=True).start()
+            # OPENAI_BASE_URL points the client at fake_llm_server.py for offline runs
+            _client = AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY', 'XXXXXXXXXXXX'),
+                base_url=os.getenv('OPENAI_BASE_URL') or None
+            )
+    return _loop
+
+
+async def _produce(messages, max_tokens, tokens):
+    try:
+        stream = await _client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                tokens.put(chunk.choices[0].delta.content)
+        tokens.put(_DONE)
+    except Exception as e:
+        tokens.put(e)
+
+
+def stream_chat(messages, max_tokens=300):
+    """
+    Yield completion tokens as they arrive. Closing the generator (e.g. the browser
+    went away) cancels the request on the event loop.
+    """
+    loop = _ensure_loop()
+    tokens = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(_produce(messages, max_tokens, tokens), loop)
+    try:
+        while True:
+            item = tokens.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
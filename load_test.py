@@ -0,0 +1,168 @@
+import argparse
+import csv
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+from fake_llm_server import start_fake_server
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ['embed', 'search', 'context', 'llm']
+ERROR_RESPONSE = "Sorry, an error occurred while processing your request."
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def load_questions(path=None):
+    if path:
+        with open(path, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    # First sentence of each knowledge-base article, phrased as a question
+    with open(os.path.join(BASE_DIR, 'CompanionX.csv'), encoding='utf-8', newline='') as f:
+        return [f"Tell me about this: {(row['Text'] or '').split('. ')[0]}?" for row in csv.DictReader(f)]
+
+
+def parse_server_timing(header):
+    stages = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.startswith('dur='):
+            stages[name] = float(params[4:])
+    return stages
+
+
+def boot_app(port, env, timeout=300):
+    """
+    Start app.py in its own process (so the load generator does not share its GIL)
+    and wait until /health reports the embedding model is loaded.
+    """
+    code = f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py exited with code {process.returncode} during startup")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            health = json.loads(conn.getresponse().read())
+            conn.close()
+            if health.get('embedding_ready'):
+                return process
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("app.py did not become ready in time")
+
+
+def ask(host, port, question):
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    start = time.perf_counter()
+    try:
+        conn.request('POST', '/', body=urlencode({'user_message': question}),
+                     headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = conn.getresponse()
+        body = json.loads(response.read())
+        ok = response.status == 200 and body.get('response') != ERROR_RESPONSE
+        stages = parse_server_timing(response.getheader('Server-Timing'))
+    except (OSError, ValueError, http.client.HTTPException):
+        ok, stages = False, {}
+    finally:
+        conn.close()
+    return ok, (time.perf_counter() - start) * 1000, stages
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples, 95)), 2),
+        'p99_ms': round(float(np.percentile(samples, 99)), 2),
+    }
+
+
+def run_load(host, port, questions, concurrency, total_requests, warmup=10):
+    for i in range(min(warmup, total_requests)):
+        ask(host, port, questions[i % len(questions)])
+
+    results = []
+    lock = threading.Lock()
+
+    def worker(i):
+        result = ask(host, port, questions[i % len(questions)])
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    succeeded = [r for r in results if r[0]]
+    report = {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': len(results) - len(succeeded),
+        'duration_s': round(elapsed, 2),
+        'throughput_rps': round(len(succeeded) / elapsed, 2),
+        'latency': summarize([r[1] for r in succeeded]),
+        'stages': {},
+    }
+    for stage in STAGES:
+        report['stages'][stage] = summarize([r[2][stage] for r in succeeded if stage in r[2]])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the RAG chat route against a local fake LLM")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200, help="requests per concurrency level")
+    parser.add_argument('--latency-ms', type=float, default=300, help="fake LLM time to first token")
+    parser.add_argument('--tokens-per-sec', type=float, default=80, help="fake LLM generation speed")
+    parser.add_argument('--questions', help="file with one question per line (default: built from the CSV)")
+    parser.add_argument('--cache', action='store_true', help="keep the embedding/answer caches enabled")
+    parser.add_argument('--app-url', help="test an already running app instead of booting one")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    process = None
+    if args.app_url:
+        url = urlparse(args.app_url)
+        host, port = url.hostname, url.port or 80
+    else:
+        llm = start_fake_server(latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec)
+        host, port = '127.0.0.1', free_port()
+        env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{llm.server_address[1]}/v1",
+                   OPENAI_API_KEY='load-test')
+        if not args.cache:
+            env.update(CHAT_EMBED_CACHE_SIZE='0', CHAT_ANSWER_CACHE_SIZE='0')
+            env.pop('CHAT_ANSWER_CACHE_DB', None)
+        process = boot_app(port, env)
+
+    try:
+        for concurrency in args.concurrency:
+            print(json.dumps(run_load(host, port, questions, concurrency, args.requests)), flush=True)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shared logging for the analytics scripts. Records are handed to a background
+# thread through a queue, so a request never waits on the log file.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Not the repo root: under XAMPP that is the web root, and logs/.htaccess denies access
+LOG_DIR = os.getenv('LOG_DIR', os.path.join(BASE_DIR, 'logs'))
+# text (the old "asctime - level - message" lines) or json (one object per line)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+# Fraction of DEBUG/INFO records kept; WARNING and above are always written
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+# Log the stage timing summary when a script exits
+LOG_TIMINGS = os.getenv('LOG_TIMINGS', '0') == '1'
+TIMING_WINDOW = int(os.getenv('TIMING_WINDOW', '1000'))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'service'}
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: ts, level, service, logger, msg, plus any fields
+    passed with extra={...}.
+    """
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'service': self.service,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    The stock prepare() formats the traceback into msg and drops exc_info, which
+    would leave JsonFormatter's exc field empty. This one merges only the args into
+    msg and carries the traceback across as exc_text, which both formatters render.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Rendered here: the traceback's frames shouldn't outlive the call
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(service, console=False):
+    """
+    Route the root logger through a queue to LOG_DIR/<service>.log (and stderr when
+    console=True). Only the first call in a process takes effect, so a module
+    imported by the analytics daemon keeps writing to the daemon's log.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        if LOG_FORMAT == 'json':
+            formatter = JsonFormatter(service)
+        else:
+            formatter = logging.Formatter(TEXT_FORMAT)
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handlers = [logging.FileHandler(os.path.join(LOG_DIR, f'{service}.log'), encoding='utf-8')]
+        if console:
+            handlers.append(logging.StreamHandler(sys.stderr))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = StructuredQueueHandler(log_queue)
+        # Sampled before enqueueing, so dropped records cost no formatting or I/O
+        queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+        root = logging.getLogger()
+        root.handlers[:] = [queue_handler]
+        root.setLevel(LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+        if LOG_TIMINGS:
+            atexit.register(log_timings)
+
+
+def shutdown():
+    """
+    Flush queued records and stop the writer thread.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+# ---------------------- Stage timings ----------------------
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+@contextmanager
+def timed(stage):
+    """
+    Record the wall time of the block under `stage` (e.g. 'recommend_exercises.fetch')
+    in a rolling window of the last TIMING_WINDOW samples.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        with _timings_lock:
+            samples = _timings.get(stage)
+            if samples is None:
+                samples = _timings[stage] = deque(maxlen=TIMING_WINDOW)
+            samples.append(elapsed)
+
+
+def timing_summary():
+    with _timings_lock:
+        snapshot = {stage: sorted(samples) for stage, samples in _timings.items() if samples}
+    summary = {}
+    for stage, ordered in sorted(snapshot.items()):
+        summary[stage] = {
+            'calls': len(ordered),
+            'mean_ms': round(sum(ordered) / len(ordered), 3),
+            'p50_ms': round(ordered[len(ordered) // 2], 3),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            'max_ms': round(ordered[-1], 3),
+        }
+    return summary
+
+
+def reset_timings():
+    with _timings_lock:
+        _timings.clear()
+
+
+def log_timings():
+    summary = timing_summary()
+    if summary:
+        # The JSON format carries the summary as a field rather than in the message
+        message = 'Stage timings' if LOG_FORMAT == 'json' else f"Stage timings: {json.dumps(summary)}"
+        logging.info(message, extra={'timings': summary})
@@ -0,0 +1,285 @@
+import argparse
+import csv
+import json
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+
+from mood_state import DEFAULT_SCORE, MOOD_MAP, WINDOW_SIZE
+
+MOOD_NAMES = list(MOOD_MAP)
+MOOD_SCORES = np.array([MOOD_MAP[m] for m in MOOD_NAMES], dtype=np.float64)
+HISTORY_LENGTH = 60
+CHUNK_SIZE = 50_000
+
+
+class HistoryBatch:
+    """
+    Mood histories for many users as padded (users x length) arrays, newest entry
+    in column 0. Rows shorter than the longest history are masked out by `valid`.
+    """
+
+    def __init__(self, scores, intensities, dow, valid):
+        self.scores = scores            # mood score 0-4 (MOOD_MAP)
+        self.intensities = intensities  # 1-10
+        self.dow = dow                  # created_at.weekday()
+        self.valid = valid
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def counts(self):
+        return self.valid.sum(axis=1)
+
+    def rows(self, start, stop):
+        return HistoryBatch(self.scores[start:stop], self.intensities[start:stop],
+                            self.dow[start:stop], self.valid[start:stop])
+
+    def shifted(self, k):
+        """
+        The histories as they were k entries ago (drop the newest k columns).
+        """
+        return HistoryBatch(self.scores[:, k:], self.intensities[:, k:], self.dow[:, k:], self.valid[:, k:])
+
+    @classmethod
+    def from_entries(cls, histories, length=HISTORY_LENGTH):
+        """
+        histories: one list per user of (mood, intensity, created_at), newest first.
+        """
+        n = len(histories)
+        scores = np.zeros((n, length), dtype=np.int8)
+        intensities = np.zeros((n, length), dtype=np.int8)
+        dow = np.zeros((n, length), dtype=np.int8)
+        valid = np.zeros((n, length), dtype=bool)
+        for i, entries in enumerate(histories):
+            for j, (mood, intensity, created_at) in enumerate(entries[:length]):
+                scores[i, j] = MOOD_MAP.get(mood, DEFAULT_SCORE)
+                intensities[i, j] = intensity
+                dow[i, j] = created_at.weekday()
+                valid[i, j] = True
+        return cls(scores, intensities, dow, valid)
+
+
+def to_mood_index(predicted_score):
+    # Nearest mood, ties going to the earlier MOOD_MAP entry like predict_from_state
+    return np.abs(MOOD_SCORES[None, :] - predicted_score[:, None]).argmin(axis=1)
+
+
+# ---------------------- Models ----------------------
+
+class RuleModel:
+    """
+    The production rule (mood_state.predict_from_state): dominant mood of the newest
+    3 entries until WINDOW_SIZE are logged, then a linearly weighted mean of the
+    mood scores over the newest WINDOW_SIZE with a weekday/weekend nudge.
+    """
+    name = 'rule'
+
+    def predict(self, batch, target_dow=None):
+        valid = batch.valid[:, :WINDOW_SIZE]
+        scores = batch.scores[:, :WINDOW_SIZE].astype(np.float64)
+        n = len(batch)
+
+        recent_valid = valid[:, :3]
+        recent = np.where(recent_valid, batch.scores[:, :3], -1)
+        counts = (recent[:, :, None] == recent[:, None, :]).sum(axis=2)
+        counts[~recent_valid] = -1
+        dominant = recent[np.arange(n), counts.argmax(axis=1)].astype(np.float64)
+
+        weights = np.linspace(1, 0.5, WINDOW_SIZE)
+        avg_score = (scores * weights).sum(axis=1) / weights.sum()
+        weekday = valid & (batch.dow[:, :WINDOW_SIZE] < 5)
+        weekend = valid & ~weekday
+        weekday_count, weekend_count = weekday.sum(axis=1), weekend.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weekday_avg = (scores * weekday).sum(axis=1) / weekday_count
+            weekend_avg = (scores * weekend).sum(axis=1) / weekend_count
+        adjust = (weekday_count > 0) & (weekend_count > 0) & (weekday_avg != 0) & (weekend_avg != 0) \
+            & (weekday_avg < weekend_avg - 0.5)
+        rule = avg_score - np.where(adjust, 0.5, 0.0)
+
+        return np.where(batch.counts() >= WINDOW_SIZE, rule, dominant)
+
+
+class EwmaModel:
+    """
+    Exponentially weighted mean of past mood scores; alpha is the weight of the newest entry.
+    """
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.name = f'ewma_{alpha:g}'
+
+    def predict(self, batch, target_dow=None):
+        decay = (1 - self.alpha) ** np.arange(batch.scores.shape[1])
+        weights = batch.valid * decay
+        return (batch.scores * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-12)
+
+
+class SeasonalModel:
+    """
+    Day-of-week baseline: mean score of past entries on the target weekday, shrunk
+    towards the user's overall mean by `prior` pseudo-entries.
+    """
+
+    def __init__(self, prior=2.0):
+        self.prior = prior
+        self.name = 'seasonal_dow'
+
+    def predict(self, batch, target_dow):
+        valid = batch.valid
+        scores = batch.scores.astype(np.float64)
+        overall = (scores * valid).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+        same_day = valid & (batch.dow == np.asarray(target_dow)[:, None])
+        day_count = same_day.sum(axis=1)
+        day_sum = (scores * same_day).sum(axis=1)
+        return (day_sum + self.prior * overall) / (day_count + self.prior)
+
+
+class LastValueModel:
+    """
+    Persistence baseline: tomorrow looks like the latest entry.
+    """
+    name = 'last'
+
+    def predict(self, batch, target_dow=None):
+        return batch.scores[:, 0].astype(np.float64)
+
+
+MODELS = {model.name: model for model in (RuleModel(), EwmaModel(0.3), EwmaModel(0.1), SeasonalModel(), LastValueModel())}
+
+
+# ---------------------- Histories ----------------------
+
+def synthetic_histories(n_users, length=HISTORY_LENGTH, seed=0):
+    """
+    Users with a personal baseline, a weekend lift and AR(1) day-to-day noise,
+    logging roughly daily. Generated column by column, so 100k+ users take seconds.
+    """
+    rng = np.random.default_rng(seed)
+    baseline = rng.normal(2.2, 0.7, n_users)
+    weekend_lift = rng.normal(0.3, 0.3, n_users)
+    counts = rng.integers(2, length + 1, n_users)
+    start_dow = rng.integers(0, 7, n_users)
+
+    latent = np.zeros((n_users, length))
+    dow = np.zeros((n_users, length), dtype=np.int8)
+    noise = rng.normal(0, 0.9, n_users)
+    day = start_dow.astype(np.int64)
+    for j in range(length):
+        # Column 0 is the newest entry; walking backwards in time one or two days per entry
+        noise = 0.6 * noise + rng.normal(0, 0.7, n_users)
+        dow[:, j] = day % 7
+        latent[:, j] = baseline + weekend_lift * (dow[:, j] >= 5) + noise
+        day = day - rng.choice([1, 1, 1, 2], n_users)
+    scores = np.clip(np.rint(latent), 0, 4).astype(np.int8)
+    intensities = np.clip(np.rint(5 + 1.5 * (latent - 2) + rng.normal(0, 1.5, (n_users, length))), 1, 10).astype(np.int8)
+    valid = np.arange(length)[None, :] < counts[:, None]
+    return HistoryBatch(scores, intensities, dow, valid)
+
+
+def load_csv_histories(path, length=HISTORY_LENGTH):
+    """
+    Read an export with user_id, mood, intensity, created_at columns (see `export`).
+    """
+    by_user = {}
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            by_user.setdefault(row['user_id'], []).append(
+                (row['mood'], int(row['intensity']), datetime.fromisoformat(row['created_at'])))
+    histories = [sorted(entries, key=lambda e: e[2], reverse=True) for entries in by_user.values()]
+    return HistoryBatch.from_entries(histories, length)
+
+
+def export_histories(conn, path, length=HISTORY_LENGTH):
+    """
+    Dump each user's newest `length` entries to CSV for offline backtests.
+    """
+    rows = conn.query(f"""
+        SELECT user_id, mood, intensity, created_at
+        FROM (
+            SELECT user_id, mood, intensity, created_at,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC, id DESC) AS rn
+            FROM user_mood_entries
+        ) ranked
+        WHERE rn <= {int(length)}
+        ORDER BY user_id, rn
+    """, dictionary=False)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'mood', 'intensity', 'created_at'])
+        for user_id, mood, intensity, created_at in rows:
+            writer.writerow([user_id, mood, intensity, created_at.isoformat(sep=' ')])
+    return len(rows)
+
+
+# ---------------------- Backtest ----------------------
+
+def backtest(batch, models, holdout=3, chunk_size=CHUNK_SIZE):
+    """
+    Replay the newest `holdout` entries of every history: each is predicted from the
+    entries before it, for users that still have at least one earlier entry.
+    Reports exact-mood accuracy, accuracy within one mood step, MAE on the 0-4
+    scale and prediction throughput.
+    """
+    results = {}
+    for model in models:
+        predicted_total = hits = near = 0
+        abs_error = 0.0
+        elapsed = 0.0
+        for start in range(0, len(batch), chunk_size):
+            chunk = batch.rows(start, start + chunk_size)
+            for k in range(1, holdout + 1):
+                history = chunk.shifted(k)
+                target_valid = chunk.valid[:, k - 1] & history.valid[:, 0]
+                if not target_valid.any():
+                    continue
+                target = chunk.scores[:, k - 1].astype(np.float64)
+                target_dow = chunk.dow[:, k - 1]
+
+                began = time.perf_counter()
+                predicted = model.predict(history, target_dow)
+                predicted_mood = MOOD_SCORES[to_mood_index(predicted)]
+                elapsed += time.perf_counter() - began
+
+                predicted_total += int(target_valid.sum())
+                hits += int((predicted_mood == target)[target_valid].sum())
+                near += int((np.abs(predicted_mood - target) <= 1)[target_valid].sum())
+                abs_error += float(np.abs(predicted_mood - target)[target_valid].sum())
+        results[model.name] = {
+            'predictions': predicted_total,
+            'accuracy': round(hits / predicted_total, 4) if predicted_total else None,
+            'within_one': round(near / predicted_total, 4) if predicted_total else None,
+            'mae': round(abs_error / predicted_total, 4) if predicted_total else None,
+            'users_per_sec': round(predicted_total / elapsed) if elapsed else None,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Compare mood forecasting models on replayed histories")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bt = sub.add_parser('backtest', help="score every model on synthetic or exported histories")
+    bt.add_argument('--synthetic', type=int, metavar='USERS', default=200_000)
+    bt.add_argument('--csv', help="history export to replay instead of synthetic users")
+    bt.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    bt.add_argument('--holdout', type=int, default=3, help="newest entries replayed per user")
+    bt.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    ex = sub.add_parser('export', help="dump user_mood_entries histories to CSV")
+    ex.add_argument('--out', default='mood_histories.csv')
+    ex.add_argument('--length', type=int, default=HISTORY_LENGTH)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        import db
+        with db.connection() as conn:
+            print(json.dumps({'rows': export_histories(conn, args.out, args.length), 'path': args.out}))
+    else:
+        start = time.perf_counter()
+        batch = load_csv_histories(args.csv) if args.csv else synthetic_histories(args.synthetic)
+        logging.info(f"Loaded {len(batch)} histories in {time.perf_counter() - start:.1f}s")
+        report = backtest(batch, [MODELS[name] for name in args.models], args.holdout, args.chunk_size)
+        print(json.dumps({'users': len(batch), 'holdout': args.holdout, 'models': report}, indent=2))
@@ -11,6 +11,7 @@ if (!isset($_SESSION['csrf_token'])) {
 }
 
 require 'config/db.php';
+require 'includes/analytics.php';
 
 $userId = filter_var($_SESSION['user_id'], FILTER_VALIDATE_INT);
 $firstName = isset($_SESSION['first_name']) ? htmlspecialchars($_SESSION['first_name'], ENT_QUOTES, 'UTF-8') : 'User';
@@ -26,7 +27,7 @@ function getAvatarUrl($avatar) {
 $moodEntries = [];
 $hasRecentMood = false;
 try {
-    $stmt = $pdo->prepare("SELECT mood, intensity, notes, created_at FROM user_mood_entries WHERE user_id = ? ORDER BY created_at DESC");
+    $stmt = $pdo->prepare("SELECT id, mood, intensity, notes, created_at FROM user_mood_entries WHERE user_id = ? ORDER BY created_at DESC");
     $stmt->execute([$userId]);
     $moodEntries = $stmt->fetchAll(PDO::FETCH_ASSOC);
     // Check if there's a mood entry from the last 24 hours
@@ -44,12 +45,44 @@ try {
     $pythonPath = escapeshellarg("C:/Users/laptop universe/AppData/Local/Programs/Python/Python311/python.exe");
     $scriptPath = escapeshellarg("C:/xampp/htdocs/Companion/predict_mood.py");
     $pythonScript = "$pythonPath $scriptPath " . escapeshellarg((string)$userId);
-    $output = shell_exec($pythonScript . " 2>&1");
-    if ($output) {
-        $prediction = json_decode($output, true);
-        error_log("Mood prediction output for user_id $userId: $output");
+    // Use the cached prediction (predict_mood.py / predict_mood_batch.py) while it covers every entry
+    $cached = false;
+    try {
+        $stmt = $pdo->prepare("SELECT mood, stability, message, entry_count, last_entry_id FROM mood_prediction_cache WHERE user_id = ?");
+        $stmt->execute([$userId]);
+        $cached = $stmt->fetch(PDO::FETCH_ASSOC);
+    } catch (PDOException $e) {
+        error_log("Error reading cached mood prediction: " . $e->getMessage());
+    }
+    // Count and highest id together, so deleting one entry and logging another also misses
+    $lastEntryId = $moodEntries ? max(array_map('intval', array_column($moodEntries, 'id'))) : 0;
+    if ($cached && (int)$cached['entry_count'] === count($moodEntries)
+            && (int)$cached['last_entry_id'] === $lastEntryId) {
+        // Pick 2 tasks here rather than with ORDER BY RAND(), which sorts the whole match set
+        $stmt = $pdo->prepare("SELECT task_type, description, icon FROM mood_tasks WHERE mood = ?");
+        $stmt->execute([$cached['mood']]);
+        $tasks = $stmt->fetchAll(PDO::FETCH_ASSOC);
+        shuffle($tasks);
+        $tasks = array_slice($tasks, 0, 2);
+        foreach ($tasks as &$task) {
+            $task['icon'] = $task['icon'] ?: 'fas fa-lightbulb';
+        }
+        unset($task);
+        $prediction = [
+            'success' => true,
+            'mood' => $cached['mood'],
+            'stability' => (int)$cached['stability'],
+            'message' => $cached['message'],
+            'tasks' => $tasks
+        ];
     } else {
-        error_log("Failed to execute mood prediction script for user_id: $userId");
+        $output = runAnalytics('predict_mood', $userId, $pythonScript);
+        if ($output) {
+            $prediction = json_decode($output, true);
+            error_log("Mood prediction output for user_id $userId: $output");
+        } else {
+            error_log("Failed to execute mood prediction script for user_id: $userId");
+        }
     }
 } catch (Exception $e) {
     error_log("Error running mood prediction: " . $e->getMessage());
@@ -74,7 +107,7 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST' && isset($_POST['mood'], $_POST['csrf_
                 $stmt = $pdo->prepare("INSERT INTO user_mood_entries (user_id, mood, intensity, notes, created_at) VALUES (?, ?, ?, ?, NOW())");
                 $stmt->execute([$userId, $mood, $intensity, $notes]);
                 // Re-run prediction
-                $output = shell_exec($pythonScript . " 2>&1");
+                $output = runAnalytics('predict_mood', $userId, $pythonScript);
                 if ($output) {
                     $prediction = json_decode($output, true);
                 }
@@ -97,7 +130,7 @@ try {
     $pythonPath = escapeshellarg("C:/Users/laptop universe/AppData/Local/Programs/Python/Python311/python.exe");
     $scriptPath = escapeshellarg("C:/xampp/htdocs/Companion/predict_mood.py");
     $pythonScript = "$pythonPath $scriptPath " . escapeshellarg((string)$userId);
-    $output = shell_exec($pythonScript . " 2>&1");
+    $output = runAnalytics('predict_mood', $userId, $pythonScript);
     if ($output) {
         $prediction = json_decode($output, true);
         error_log("Mood prediction output for user_id $userId: $output");
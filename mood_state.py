@@ -0,0 +1,292 @@
+import argparse
+import bisect
+import json
+import logging
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import db
+
+# Prediction only ever looks at the most recent WINDOW_SIZE entries
+WINDOW_SIZE = 14
+MOOD_MAP = {'Happy': 4, 'Excited': 3, 'Neutral': 2, 'Sad': 1, 'Angry': 0}
+DEFAULT_SCORE = 2
+
+
+# ---------------------- State ----------------------
+
+def empty_state():
+    return {
+        'entry_count': 0,
+        'last_entry_id': 0,
+        # Newest first, at most WINDOW_SIZE entries
+        'window': [],
+        'intensity_sum': 0,
+        'weekday_score_sum': 0,
+        'weekday_count': 0,
+        'weekend_score_sum': 0,
+        'weekend_count': 0,
+    }
+
+
+def window_entry(row):
+    return {
+        'id': int(row['id']),
+        'mood': row['mood'],
+        'intensity': int(row['intensity']),
+        'created_at': row['created_at'].isoformat(sep=' '),
+        'weekday': row['created_at'].weekday() < 5,
+    }
+
+
+def _sort_key(entry):
+    # Matches ORDER BY created_at DESC, id DESC
+    return (entry['created_at'], entry['id'])
+
+
+def _apply_aggregates(state, entry, sign):
+    score = MOOD_MAP.get(entry['mood'], DEFAULT_SCORE)
+    state['intensity_sum'] += sign * entry['intensity']
+    if entry['weekday']:
+        state['weekday_score_sum'] += sign * score
+        state['weekday_count'] += sign
+    else:
+        state['weekend_score_sum'] += sign * score
+        state['weekend_count'] += sign
+
+
+def add_entry(state, row):
+    """
+    Fold one new user_mood_entries row into the state. The window stays ordered by
+    (created_at, id) descending, so a back-dated entry lands in the right place or,
+    if it is older than the whole window, only bumps the count.
+    """
+    entry = window_entry(row)
+    state['entry_count'] += 1
+    state['last_entry_id'] = max(state['last_entry_id'], entry['id'])
+
+    window = state['window']
+    keys = [_sort_key(e) for e in reversed(window)]
+    position = len(window) - bisect.bisect_left(keys, _sort_key(entry))
+    if position >= WINDOW_SIZE:
+        return state
+    window.insert(position, entry)
+    _apply_aggregates(state, entry, 1)
+    if len(window) > WINDOW_SIZE:
+        _apply_aggregates(state, window.pop(), -1)
+    return state
+
+
+def state_from_entries(rows, entry_count=None):
+    """
+    Build a state from rows ordered newest first. entry_count defaults to len(rows);
+    pass the real total when rows is only the newest WINDOW_SIZE.
+    """
+    state = empty_state()
+    state['window'] = [window_entry(row) for row in rows[:WINDOW_SIZE]]
+    for entry in state['window']:
+        _apply_aggregates(state, entry, 1)
+    state['entry_count'] = len(rows) if entry_count is None else entry_count
+    state['last_entry_id'] = max((int(row['id']) for row in rows), default=0)
+    return state
+
+
+def predict_from_state(state):
+    """
+    Predict (mood, stability, message) from a user's rolling state. Cost depends
+    only on WINDOW_SIZE, not on how many entries the user has logged.
+    """
+    window = state['window']
+    entry_count = state['entry_count']
+    if not window:
+        return 'Neutral', 50, 'Please log some moods to get personalized predictions.'
+
+    if entry_count < WINDOW_SIZE:
+        # First 14 entries: Use recent 3 entries for simple analysis
+        recent = window[:3]
+        avg_intensity = np.mean([entry['intensity'] for entry in recent])
+        moods = [entry['mood'] for entry in recent]
+        dominant_mood = max(moods, key=moods.count)
+        stability = min(max(round(avg_intensity * 10), 0), 100)
+        return dominant_mood, stability, f"Your recent mood is mostly {dominant_mood.lower()}. {entry_count}/14 entries logged."
+
+    # After 14 entries: Predict mood using weighted moving average (recent entries weigh more),
+    # kept on the MOOD_MAP scale; intensity only feeds stability
+    scores = np.array([MOOD_MAP.get(entry['mood'], DEFAULT_SCORE) for entry in window])
+    weights = np.linspace(1, 0.5, len(window))
+    avg_score = np.sum(scores * weights) / np.sum(weights)
+
+    # Behavioral factors (e.g., day of week)
+    weekday_avg = state['weekday_score_sum'] / state['weekday_count'] if state['weekday_count'] else None
+    weekend_avg = state['weekend_score_sum'] / state['weekend_count'] if state['weekend_count'] else None
+
+    predicted_score = avg_score
+    if weekday_avg and weekend_avg and weekday_avg < weekend_avg - 0.5:
+        predicted_score -= 0.5  # Adjust for lower weekday moods
+    predicted_mood = min(MOOD_MAP.keys(), key=lambda k: abs(MOOD_MAP[k] - predicted_score))
+
+    stability = min(max(round(state['intensity_sum'] / len(window) * 10), 0), 100)
+    advice = 'Consider booking a session if mood dips persist.' if predicted_mood in ['Sad', 'Angry'] else 'Keep it up!'
+    message = f"Predicted mood: {predicted_mood.lower()} based on {entry_count} entries. {advice}"
+    return predicted_mood, stability, message
+
+
+# ---------------------- Storage ----------------------
+
+STATE_COLUMNS = ['entry_count', 'last_entry_id', 'intensity_sum', 'weekday_score_sum',
+                 'weekday_count', 'weekend_score_sum', 'weekend_count']
+
+
+def load_state(conn, user_id):
+    row = conn.query_one(f"""
+        SELECT {', '.join(STATE_COLUMNS)}, window_json
+        FROM user_mood_state
+        WHERE user_id = %s
+    """, (user_id,))
+    if row is None:
+        return None
+    state = {column: int(row[column]) for column in STATE_COLUMNS}
+    state['window'] = json.loads(row['window_json'])
+    return state
+
+
+def save_state(conn, user_id, state):
+    conn.upsert('user_mood_state', ['user_id', *STATE_COLUMNS, 'window_json'], ['user_id'],
+                [(user_id, *[state[column] for column in STATE_COLUMNS], json.dumps(state['window']))])
+
+
+def fetch_entries_after(conn, user_id, after_id):
+    return conn.query("""
+        SELECT id, mood, intensity, created_at
+        FROM user_mood_entries
+        WHERE user_id = %s AND id > %s
+        ORDER BY id
+    """, (user_id, after_id))
+
+
+def scan_state(conn, user_id, full=False):
+    """
+    Build a user's state from user_mood_entries. By default only the newest
+    WINDOW_SIZE rows are transferred; full=True reads the entire history the way
+    predict_mood used to, for the consistency check.
+    """
+    rows = conn.query(f"""
+        SELECT id, mood, intensity, created_at
+        FROM user_mood_entries
+        WHERE user_id = %s
+        ORDER BY created_at DESC, id DESC
+        {'' if full else f'LIMIT {WINDOW_SIZE}'}
+    """, (user_id,))
+    if full:
+        return state_from_entries(rows)
+    totals = conn.query_one("SELECT COUNT(*) AS n, MAX(id) AS last_id FROM user_mood_entries WHERE user_id = %s",
+                            (user_id,))
+    state = state_from_entries(rows, entry_count=int(totals['n']))
+    state['last_entry_id'] = int(totals['last_id'] or 0)
+    return state
+
+
+def refresh_state(conn, user_id):
+    """
+    Return the user's up-to-date state, folding in any entries logged since it was
+    last saved (normally just the one that triggered the prediction). Users without
+    a state row are bootstrapped from their newest WINDOW_SIZE entries.
+    """
+    with conn.transaction():
+        state = load_state(conn, user_id)
+        if state is None:
+            state = scan_state(conn, user_id)
+            save_state(conn, user_id, state)
+            logging.info(f"Bootstrapped mood state for user_id {user_id} ({state['entry_count']} entries)")
+            return state
+
+        new_rows = fetch_entries_after(conn, user_id, state['last_entry_id'])
+        if new_rows:
+            for row in new_rows:
+                add_entry(state, row)
+            save_state(conn, user_id, state)
+            logging.info(f"Applied {len(new_rows)} new mood entries for user_id {user_id}")
+    return state
+
+
+# ---------------------- Maintenance ----------------------
+
+def fetch_user_ids(conn):
+    rows = conn.query("SELECT DISTINCT user_id FROM user_mood_entries ORDER BY user_id", dictionary=False)
+    return [row[0] for row in rows]
+
+
+def rebuild(conn, user_ids=None):
+    """
+    Recompute state rows from user_mood_entries. Run once to backfill, and after
+    entries are edited or deleted outside the normal insert path.
+    """
+    user_ids = user_ids or fetch_user_ids(conn)
+    for user_id in user_ids:
+        with conn.transaction():
+            save_state(conn, user_id, scan_state(conn, user_id))
+    logging.info(f"Rebuilt mood state for {len(user_ids)} users")
+    return len(user_ids)
+
+
+def check_constant_histories():
+    """
+    A full window of one mood, at any intensity, must predict that mood. Returns
+    the (mood, intensity, predicted) cases that don't.
+    """
+    failures = []
+    start = datetime(2024, 1, 1)
+    for mood in MOOD_MAP:
+        for intensity in (1, 5, 10):
+            rows = [{'id': i + 1, 'mood': mood, 'intensity': intensity, 'created_at': start - timedelta(days=i)}
+                    for i in range(WINDOW_SIZE)]
+            predicted = predict_from_state(state_from_entries(rows))[0]
+            if predicted != mood:
+                failures.append({'mood': mood, 'intensity': intensity, 'predicted': predicted})
+    return failures
+
+
+def check(conn, user_ids=None):
+    """
+    Compare each user's stored state, with newer entries folded in memory, and its
+    prediction against a full scan of their history. Read-only: nothing is saved.
+    Returns the mismatches and the number of users with no stored state.
+    """
+    mismatches = []
+    missing = 0
+    for user_id in user_ids or fetch_user_ids(conn):
+        incremental = load_state(conn, user_id)
+        if incremental is None:
+            missing += 1
+            continue
+        for row in fetch_entries_after(conn, user_id, incremental['last_entry_id']):
+            add_entry(incremental, row)
+        scanned = scan_state(conn, user_id, full=True)
+        differing = [c for c in STATE_COLUMNS if incremental[c] != scanned[c]]
+        if [e['id'] for e in incremental['window']] != [e['id'] for e in scanned['window']]:
+            differing.append('window')
+        if predict_from_state(incremental) != predict_from_state(scanned):
+            differing.append('prediction')
+        if differing:
+            mismatches.append({'user_id': user_id, 'fields': differing})
+    return mismatches, missing
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain the per-user rolling mood state")
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('user_ids', type=int, nargs='*', help="limit to these users (default: all)")
+    args = parser.parse_args()
+
+    with db.connection() as conn:
+        if args.command == 'rebuild':
+            print(json.dumps({'rebuilt': rebuild(conn, args.user_ids)}))
+        else:
+            mismatches, missing = check(conn, args.user_ids)
+            constant_failures = check_constant_histories()
+            print(json.dumps({'mismatches': mismatches, 'missing_state': missing,
+                              'constant_history_failures': constant_failures}))
+            sys.exit(1 if mismatches or constant_failures else 0)
@@ -2,6 +2,7 @@
 <?php
 require_once 'config/db.php';
 require_once 'includes/session.php';
+require_once 'includes/analytics.php';
 
 // Redirect if not logged in
 if (!isset($_SESSION['user_id'])) {
@@ -58,27 +59,19 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
         // Mark user as completed questionnaire
         $pdo->prepare("UPDATE users SET has_completed_questionnaire = 1 WHERE id = ?")->execute([$userId]);
 
-        // Trigger exercise recommendation script
+        // Exercise and consultant recommendations in one pass: answers are read once
+        // and both result sets are stored together
         $pythonPath = "\"C:/Users/laptop universe/AppData/Local/Programs/Python/Python311/python.exe\"";
-        $scriptPath = "\"C:/xampp/htdocs/Companion/recommend_exercises.py\"";
+        $scriptPath = "\"C:/xampp/htdocs/Companion/onboarding_pipeline.py\"";
         $pythonScript = "$pythonPath $scriptPath " . escapeshellarg($userId);
-        $output = shell_exec($pythonScript . " 2>&1");
+        $output = runAnalytics('onboard', $userId, $pythonScript);
         if ($output === null) {
-            error_log("Failed to execute recommend_exercises.py for user_id: $userId");
+            error_log("Failed to execute onboarding_pipeline.py for user_id: $userId");
         } else {
-            error_log("Exercise recommendation script output for user_id $userId: $output");
+            error_log("Onboarding recommendation output for user_id $userId: $output");
+            $onboarding = json_decode($output, true);
             // Optionally store recommendations in session for dashboard display
-            $_SESSION['exercise_recommendations'] = json_decode($output, true);
-        }
-
-        // Optionally keep the consultant recommendation script
-        $consultantScriptPath = "\"C:/xampp/htdocs/Companion/recommend_consultants.py\"";
-        $consultantScript = "$pythonPath $consultantScriptPath " . escapeshellarg($userId);
-        $consultantOutput = shell_exec($consultantScript . " 2>&1");
-        if ($consultantOutput === null) {
-            error_log("Failed to execute recommend_consultants.py for user_id: $userId");
-        } else {
-            error_log("Consultant recommendation script output for user_id $userId: $consultantOutput");
+            $_SESSION['exercise_recommendations'] = $onboarding['exercises'] ?? null;
         }
 
         // Regenerate CSRF token after successful submission
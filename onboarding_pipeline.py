@@ -0,0 +1,101 @@
+import json
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import log_config
+
+# Before the recommender modules, whose own setup_logging calls then leave this in place
+log_config.setup_logging('onboarding')
+
+import analytics_client
+import bulk_writer
+import db
+import recommend_consultants
+import recommend_excercises
+import signup_profile
+from log_config import timed
+
+# Both recommenders score on this pool while the calling thread waits
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='onboarding')
+
+
+def _result(job, name, user_id):
+    if job is None:
+        return []
+    try:
+        return job.result()
+    except Exception as e:
+        # One recommender failing still leaves the other's results
+        logging.error(f"Error computing {name} recommendations for user_id {user_id}: {e}")
+        return []
+
+
+def onboard(user_id):
+    """
+    Exercise and consultant recommendations for a user who has just completed the
+    signup questionnaire. Answers and moods are read once and parsed into one
+    profile, both recommenders score it side by side, and both result sets are
+    stored in one transaction.
+    """
+    try:
+        # Catalogs first (they may borrow their own connection to refresh)
+        with timed('onboarding.catalog'):
+            exercises = recommend_excercises.fetch_exercises()
+            try:
+                consultants = recommend_consultants.fetch_consultants()
+            except Exception:
+                consultants = []
+
+        with db.connection() as conn:
+            with timed('onboarding.fetch'):
+                answers = signup_profile.fetch_answers(conn, user_id)
+                moods = recommend_excercises.fetch_user_moods(conn, user_id)
+            if not answers:
+                logging.warning(f"No answers found for user_id {user_id}. Skipping recommendations.")
+                return {'exercises': [], 'consultants': []}
+            profile = signup_profile.parse_answers(answers)
+
+            with timed('onboarding.score'):
+                signals = recommend_excercises.user_signals(profile, moods)
+                exercise_job = _executor.submit(recommend_excercises.rank_exercises, signals, exercises) \
+                    if exercises else None
+                consultant_job = _executor.submit(recommend_consultants.rank_consultants, profile, consultants) \
+                    if consultants else None
+                top_exercises = _result(exercise_job, 'exercise', user_id)
+                top_consultants = _result(consultant_job, 'consultant', user_id)
+
+            now = datetime.now()
+            with timed('onboarding.store'), conn.transaction():
+                if top_exercises:
+                    bulk_writer.write_user_rows(conn, bulk_writer.EXERCISE_RECOMMENDATIONS,
+                                                {user_id: [(rec['id'],) for rec in top_exercises]}, now)
+                    recommend_excercises.save_cached(conn, user_id, recommend_excercises.inputs_fingerprint(answers, moods),
+                                                     signals, top_exercises,
+                                                     recommend_excercises.category_versions(exercises))
+                if top_consultants:
+                    recommend_consultants.store_recommendations(conn, {user_id: top_consultants}, now)
+
+        logging.info(f"Onboarded user_id {user_id}: {len(top_exercises)} exercises, "
+                     f"{len(top_consultants)} consultants")
+        return {'exercises': top_exercises, 'consultants': top_consultants}
+    except Exception as e:
+        logging.error(f"Error onboarding user_id {user_id}: {e}")
+        return {'exercises': [], 'consultants': []}
+
+
+if __name__ == "__main__":
+    try:
+        if len(sys.argv) < 2:
+            logging.error("No user_id provided")
+            sys.exit("Error: Please provide a user_id as a command-line argument")
+        user_id = int(sys.argv[1])
+        logging.info(f"Starting onboarding recommendations for user_id {user_id}")
+        print(json.dumps(analytics_client.run('onboard', user_id, onboard), default=str))
+    except ValueError:
+        logging.error("Invalid user_id format")
+        sys.exit("Error: user_id must be an integer")
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        sys.exit("Error: An unexpected error occurred")
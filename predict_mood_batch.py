@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import db
+from mood_state import DEFAULT_SCORE, MOOD_MAP, WINDOW_SIZE
+
+CHUNK_SIZE = 5000
+MOOD_NAMES = list(MOOD_MAP)
+MOOD_SCORES = np.array([MOOD_MAP[m] for m in MOOD_NAMES], dtype=np.float64)
+WEIGHTS = np.linspace(1, 0.5, WINDOW_SIZE)
+
+
+def fetch_user_ids(conn, active_days=None):
+    if active_days:
+        rows = conn.query("""
+            SELECT DISTINCT user_id FROM user_mood_entries
+            WHERE created_at >= %s
+            ORDER BY user_id
+        """, (datetime.now() - timedelta(days=active_days),), dictionary=False)
+    else:
+        rows = conn.query("SELECT DISTINCT user_id FROM user_mood_entries ORDER BY user_id", dictionary=False)
+    return [row[0] for row in rows]
+
+
+def fetch_windows(conn, user_ids):
+    """
+    Newest WINDOW_SIZE entries plus the total entry count for each user, ordered by
+    user and recency. The window function keeps older history on the server.
+    """
+    return conn.query(f"""
+        SELECT user_id, mood, intensity, created_at, entry_count, last_entry_id
+        FROM (
+            SELECT user_id, mood, intensity, created_at,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC, id DESC) AS rn,
+                   COUNT(*) OVER (PARTITION BY user_id) AS entry_count,
+                   MAX(id) OVER (PARTITION BY user_id) AS last_entry_id
+            FROM user_mood_entries
+            WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})
+        ) ranked
+        WHERE rn <= {WINDOW_SIZE}
+        ORDER BY user_id, rn
+    """, tuple(user_ids), dictionary=False)
+
+
+def predict_chunk(rows):
+    """
+    Vectorized equivalent of mood_state.predict_from_state for many users at once.
+    rows are (user_id, mood, intensity, created_at, entry_count, last_entry_id) tuples ordered by
+    user_id and then newest first, at most WINDOW_SIZE per user. Returns
+    (user_id, mood, stability, message, entry_count, last_entry_id) tuples.
+    """
+    if not rows:
+        return []
+    user_col = np.array([r[0] for r in rows])
+    users, starts, inverse = np.unique(user_col, return_index=True, return_inverse=True)
+    position = np.arange(len(rows)) - starts[inverse]
+    n_users = len(users)
+
+    # Mood strings -> codes; anything outside MOOD_MAP scores as DEFAULT_SCORE like the single-user path
+    vocab, mood_codes = np.unique(np.array([r[1] for r in rows], dtype=object).astype(str), return_inverse=True)
+    vocab_scores = np.array([MOOD_MAP.get(m, DEFAULT_SCORE) for m in vocab], dtype=np.float64)
+
+    valid = np.zeros((n_users, WINDOW_SIZE), dtype=bool)
+    codes = np.full((n_users, WINDOW_SIZE), -1)
+    scores = np.zeros((n_users, WINDOW_SIZE))
+    intensities = np.zeros((n_users, WINDOW_SIZE))
+    weekday = np.zeros((n_users, WINDOW_SIZE), dtype=bool)
+    valid[inverse, position] = True
+    codes[inverse, position] = mood_codes
+    scores[inverse, position] = vocab_scores[mood_codes]
+    intensities[inverse, position] = [r[2] for r in rows]
+    weekday[inverse, position] = [r[3].weekday() < 5 for r in rows]
+    entry_counts = np.zeros(n_users, dtype=np.int64)
+    entry_counts[inverse] = [r[4] for r in rows]
+    last_entry_ids = np.zeros(n_users, dtype=np.int64)
+    last_entry_ids[inverse] = [r[5] for r in rows]
+
+    # Fewer than WINDOW_SIZE entries: dominant mood and mean intensity of the newest 3,
+    # ties going to the most recent mood
+    recent_valid = valid[:, :3]
+    recent_codes = np.where(recent_valid, codes[:, :3], -1)
+    counts = (recent_codes[:, :, None] == recent_codes[:, None, :]).sum(axis=2)
+    counts[~recent_valid] = -1
+    dominant = recent_codes[np.arange(n_users), counts.argmax(axis=1)]
+    recent_stability = np.round((intensities[:, :3] * recent_valid).sum(axis=1) / recent_valid.sum(axis=1) * 10)
+
+    # Full window: weighted moving average of the mood scores with the weekday adjustment
+    avg_score = (scores * WEIGHTS).sum(axis=1) / WEIGHTS.sum()
+    weekday_count = weekday.sum(axis=1)
+    weekend_count = (valid & ~weekday).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weekday_avg = (scores * weekday).sum(axis=1) / weekday_count
+        weekend_avg = (scores * (valid & ~weekday)).sum(axis=1) / weekend_count
+    adjust = (weekday_count > 0) & (weekend_count > 0) & (weekday_avg != 0) & (weekend_avg != 0) \
+        & (weekday_avg < weekend_avg - 0.5)
+    predicted_score = avg_score - np.where(adjust, 0.5, 0.0)
+    predicted = np.abs(MOOD_SCORES[None, :] - predicted_score[:, None]).argmin(axis=1)
+    window_stability = np.round(intensities.sum(axis=1) / valid.sum(axis=1) * 10)
+
+    full = entry_counts >= WINDOW_SIZE
+    stability = np.clip(np.where(full, window_stability, recent_stability), 0, 100).astype(int)
+
+    results = []
+    for i in range(n_users):
+        n = int(entry_counts[i])
+        if full[i]:
+            mood = MOOD_NAMES[predicted[i]]
+            advice = 'Consider booking a session if mood dips persist.' if mood in ['Sad', 'Angry'] else 'Keep it up!'
+            message = f"Predicted mood: {mood.lower()} based on {n} entries. {advice}"
+        else:
+            mood = str(vocab[dominant[i]])
+            message = f"Your recent mood is mostly {mood.lower()}. {n}/14 entries logged."
+        results.append((int(users[i]), mood, int(stability[i]), message, n, int(last_entry_ids[i])))
+    return results
+
+
+def write_predictions(conn, predictions, computed_at=None):
+    """
+    Upsert (user_id, mood, stability, message, entry_count, last_entry_id) rows into
+    mood_prediction_cache, which the PHP pages read without running Python. A row is
+    current while the user's entry count and highest entry id both still match, so
+    deleting one entry and logging another also invalidates it.
+    """
+    computed_at = computed_at or datetime.now()
+    with conn.transaction():
+        conn.upsert('mood_prediction_cache',
+                    ['user_id', 'mood', 'stability', 'message', 'entry_count', 'last_entry_id', 'computed_at'],
+                    ['user_id'],
+                    [(*p, computed_at) for p in predictions])
+
+
+def run_batch(conn, chunk_size=CHUNK_SIZE, active_days=None):
+    """
+    Predict and cache moods for every user with entries (or only those active in the
+    last active_days), holding one chunk of users in memory at a time.
+    """
+    start = time.perf_counter()
+    computed_at = datetime.now()
+    user_ids = fetch_user_ids(conn, active_days)
+    written = 0
+    for i in range(0, len(user_ids), chunk_size):
+        predictions = predict_chunk(fetch_windows(conn, user_ids[i:i + chunk_size]))
+        write_predictions(conn, predictions, computed_at)
+        written += len(predictions)
+        logging.info(f"Cached mood predictions for {written}/{len(user_ids)} users")
+    return {'users': written, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+def synthetic_windows(n_users, seed=0):
+    rng = random.Random(seed)
+    moods = MOOD_NAMES
+    base = datetime(2025, 1, 1)
+    rows = []
+    for user_id in range(1, n_users + 1):
+        n = rng.randrange(1, 60)
+        for rn in range(min(n, WINDOW_SIZE)):
+            rows.append((user_id, rng.choice(moods), rng.randint(1, 10),
+                         base - timedelta(hours=rn * 11 + rng.randrange(10)), n, user_id * 100))
+    return rows
+
+
+def benchmark(n_users, loop_sample=2000):
+    """
+    Vectorized chunks vs the per-user predict_from_state loop on synthetic windows;
+    the loop is timed on a sample and extrapolated.
+    """
+    from mood_state import predict_from_state, state_from_entries
+    rows = synthetic_windows(n_users)
+    chunks = {}
+    for r in rows:
+        chunks.setdefault((r[0] - 1) // CHUNK_SIZE, []).append(r)
+
+    start = time.perf_counter()
+    batched = []
+    for chunk in chunks.values():
+        batched.extend(predict_chunk(chunk))
+    vectorized_s = time.perf_counter() - start
+
+    by_user = {}
+    for r in rows:
+        by_user.setdefault(r[0], []).append({'id': 0, 'mood': r[1], 'intensity': r[2], 'created_at': r[3]})
+    sample = list(by_user.items())[:loop_sample]
+    start = time.perf_counter()
+    looped = [predict_from_state(state_from_entries(entries, entry_count=rows_n))
+              for (_, entries), rows_n in zip(sample, (b[4] for b in batched))]
+    loop_s = (time.perf_counter() - start) / len(sample) * n_users
+
+    mismatches = sum(1 for b, l in zip(batched, looped) if b[1:4] != l)
+    return {
+        'users': n_users,
+        'vectorized_s': round(vectorized_s, 2),
+        'per_user_loop_s_estimated': round(loop_s, 2),
+        'compared': len(sample),
+        'mismatches': mismatches,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Predict moods for all users in one pass and cache the results")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="users per query")
+    parser.add_argument('--active-days', type=int, help="only users with an entry in the last N days")
+    parser.add_argument('--benchmark', type=int, metavar='USERS', help="time synthetic data instead of the database")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.benchmark)))
+    else:
+        with db.connection() as conn:
+            print(json.dumps(run_batch(conn, args.chunk_size, args.active_days)))
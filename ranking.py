@@ -0,0 +1,13 @@
+import numpy as np
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first, picked with argpartition. Ties
+    keep index order, exactly like a stable sort over every score would.
+    """
+    if len(scores) <= k:
+        return np.argsort(-scores, kind='stable')
+    threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.lexsort((candidates, -scores[candidates]))][:k]
@@ -1,43 +1,31 @@
-import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import mysql.connector
 import json
+import re
 from datetime import datetime
+from itertools import groupby
 import sys
+import time
 import logging
+import analytics_client
+import bulk_writer
+import catalog_cache
+import db
+import log_config
+import signup_profile
+from log_config import timed
+from ranking import top_k
 
 # Set up logging
-logging.basicConfig(filename='C:/xampp/htdocs/Companion/recommend_consultants.log', level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+log_config.setup_logging('recommend_consultants')
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host="127.0.0.1",
-            user="root",
-            password="",
-            database="companionx"
-        )
-        logging.info("Database connection successful")
-        return conn
-    except mysql.connector.Error as e:
-        logging.error(f"Database connection failed: {e}")
-        raise
+TOP_K = 5
+# Users scored per matrix product (and per write transaction) by rescore_all
+RESCORE_CHUNK = 2000
 
-def fetch_user_answers(user_id):
+def fetch_user_answers(conn, user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT question_id, answer_text
-            FROM user_signup_answers
-            WHERE user_id = %s
-        """, (user_id,))
-        answers = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        logging.info(f"Fetched {len(answers)} answers for user_id {user_id}")
+        answers = signup_profile.fetch_answers(conn, user_id)
+        logging.debug("Fetched %d answers for user_id %s", len(answers), user_id)
         return answers
     except Exception as e:
         logging.error(f"Error fetching user answers: {e}")
@@ -45,38 +33,45 @@ def fetch_user_answers(user_id):
 
 def fetch_consultants():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, specialization, tags
-            FROM consultants
-            WHERE status = 'active' AND is_available = 1
-        """)
-        consultants = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        logging.info(f"Fetched {len(consultants)} active consultants")
+        consultants = catalog_cache.consultants.all()
+        logging.debug("Fetched %d active consultants", len(consultants))
         return consultants
     except Exception as e:
         logging.error(f"Error fetching consultants: {e}")
         raise
 
-def create_user_vector(answers):
+def create_user_vector(profile):
+    """
+    (ratings for questions 4-12 as a 9-vector, checklist reasons) from a profile
+    built by signup_profile.parse_answers.
+    """
     vector = np.zeros(9)
-    reasons = []
+    reasons = profile['reasons']
 
-    for answer in answers:
-        qid = answer['question_id']
-        text = answer['answer_text']
-        if qid in range(4, 13):
-            vector[qid - 4] = int(text)
-        elif qid == 999:
-            reasons = text.split(', ')
+    for qid, rating in profile['ratings'].items():
+        if rating is None:
+            raise ValueError(f"non-numeric answer to question {qid}")
+        vector[qid - 4] = rating
 
-    logging.info(f"User vector: {vector.tolist()}, Reasons: {reasons}")
+    # Lazy %-args: formatted only when DEBUG is enabled
+    logging.debug("User vector: %s, Reasons: %s", vector, reasons)
     return vector, reasons
 
-def create_consultant_vector(specialization, tags):
+def normalize_term(text):
+    return ' '.join(text.lower().split())
+
+def split_tags(tags):
+    """
+    The comma-separated tags column as normalized terms.
+    """
+    return [term for term in (normalize_term(tag) for tag in (tags or '').split(',')) if term]
+
+def specialization_terms(specialization):
+    # "Stress & Anxiety", "Stress/Anxiety" and "Stress and Anxiety" name two terms each
+    parts = re.split(r',|/|&|\band\b', (specialization or '').lower())
+    return {term for term in [normalize_term(specialization or ''), *map(normalize_term, parts)] if term}
+
+def create_consultant_vector(specialization, tag_terms):
     specialization_map = {
         'Stress': [1, 0, 0, 0, 0, 0, 0, 0, 0],
         'Anxiety': [0, 1, 0, 0, 0, 0, 0, 0, 0],
@@ -85,64 +80,171 @@ def create_consultant_vector(specialization, tags):
     }
     vector = specialization_map.get(specialization, [0] * 9)
 
-    if tags:
-        tags = tags.split(',')
-        for tag in tags:
-            if tag.strip().lower() in ['anxiety', 'youth']:
-                vector[1] += 0.5
+    for tag in tag_terms:
+        if tag in ['anxiety', 'youth']:
+            vector[1] += 0.5
 
-    logging.info(f"Consultant vector for {specialization}: {vector}")
+    logging.debug("Consultant vector for %s: %s", specialization, vector)
     return np.array(vector)
 
+def normalize_rows(vectors):
+    # Same as sklearn's cosine_similarity: zero rows stay zero and score 0
+    norms = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    norms[norms == 0] = 1
+    return vectors / norms[:, None]
+
+class ConsultantMatrix:
+    """
+    Unit-normalized vectors for one snapshot of the consultants catalog, one row
+    per consultant in catalog order, and an inverted index from normalized
+    specialization / tag terms to the rows carrying them.
+    """
+
+    def __init__(self, consultants):
+        self.rows = consultants
+        self.ids = np.array([c['id'] for c in consultants], dtype=np.int64)
+        # Tags are split and normalized once per snapshot, not per call
+        tag_terms = [split_tags(c['tags']) for c in consultants]
+        vectors = np.array([create_consultant_vector(c['specialization'], tags)
+                            for c, tags in zip(consultants, tag_terms)],
+                           dtype=np.float64).reshape(len(consultants), 9)
+        self.vectors = normalize_rows(vectors)
+        terms = {}
+        for position, (consultant, tags) in enumerate(zip(consultants, tag_terms)):
+            for term in specialization_terms(consultant['specialization']) | set(tags):
+                terms.setdefault(term, []).append(position)
+        self.terms = {term: np.array(positions, dtype=np.int64) for term, positions in terms.items()}
+
+    def reason_match(self, reason):
+        """
+        Rows whose specialization or tags include reason as a whole term,
+        case-insensitively; None when no consultant does.
+        """
+        return self.terms.get(normalize_term(reason))
+
+    def score(self, user_vectors, reasons_per_user):
+        """
+        (users x consultants) cosine similarity plus 0.1 per matching reason, capped at 1.
+        """
+        scores = normalize_rows(np.asarray(user_vectors, dtype=np.float64)) @ self.vectors.T
+        for i, reasons in enumerate(reasons_per_user):
+            for reason in reasons:
+                # Only the matching consultants are touched
+                positions = self.reason_match(reason)
+                if positions is not None:
+                    scores[i, positions] += 0.1
+        # Rounded so equal scores tie exactly whatever the BLAS summation order
+        return np.minimum(np.round(scores, 12), 1.0)
+
+_matrix = None
+
+def consultant_matrix(consultants):
+    """
+    The matrix for the current catalog rows, rebuilt only when the catalog has
+    reloaded (it swaps in a new rows list whenever the consultants table changes).
+    """
+    global _matrix
+    matrix = _matrix
+    if matrix is None or matrix.rows is not consultants:
+        matrix = _matrix = ConsultantMatrix(consultants)
+        logging.info(f"Built consultant matrix for {len(consultants)} consultants")
+    return matrix
+
+def rank_consultants(profile, consultants):
+    """
+    The user's top consultants as [{'consultant_id', 'score'}], best first.
+    """
+    user_vector, user_reasons = create_user_vector(profile)
+    matrix = consultant_matrix(consultants)
+    scores = matrix.score([user_vector], [user_reasons])[0]
+    return [{'consultant_id': int(matrix.ids[i]), 'score': float(scores[i])} for i in top_k(scores, TOP_K)]
+
+def store_recommendations(conn, recommendations_by_user, now):
+    """
+    Swap in each user's new top consultants in one transaction, leaving rows
+    whose consultant and score did not change untouched.
+    """
+    return bulk_writer.write_user_rows(conn, bulk_writer.CONSULTANT_RECOMMENDATIONS, {
+        user_id: [(rec['consultant_id'], float(rec['score'])) for rec in recommendations]
+        for user_id, recommendations in recommendations_by_user.items()
+    }, now)
+
 def compute_recommendations(user_id):
     try:
-        answers = fetch_user_answers(user_id)
-        if not answers:
-            logging.warning(f"No answers found for user_id {user_id}. Skipping recommendations.")
-            return
-
-        consultants = fetch_consultants()
-        if not consultants:
-            logging.warning("No active consultants found. Skipping recommendations.")
-            return
-
-        user_vector, user_reasons = create_user_vector(answers)
-
-        recommendations = []
-        for consultant in consultants:
-            consultant_vector = create_consultant_vector(consultant['specialization'], consultant['tags'])
-            score = cosine_similarity([user_vector], [consultant_vector])[0][0]
-
-            for reason in user_reasons:
-                if reason in consultant['specialization'] or (consultant['tags'] and reason.lower() in consultant['tags'].lower()):
-                    score += 0.1
-
-            recommendations.append({
-                'consultant_id': consultant['id'],
-                'score': min(score, 1.0)
-            })
-
-        recommendations = sorted(recommendations, key=lambda x: x['score'], reverse=True)[:5]
-        logging.info(f"Top 5 recommendations for user_id {user_id}: {recommendations}")
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM ai_consultant_recommendations WHERE user_id = %s", (user_id,))
-        for rec in recommendations:
-            cursor.execute("""
-                INSERT INTO ai_consultant_recommendations (user_id, consultant_id, recommendation_score, recommended_at)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, rec['consultant_id'], rec['score'], datetime.now()))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        logging.info(f"Saved recommendations for user_id {user_id}")
+        # Catalog first (it may borrow its own connection to refresh), then one pooled
+        # connection; the replace of the user's recommendations is atomic
+        with timed('recommend_consultants.catalog'):
+            consultants = fetch_consultants()
+        with db.connection() as conn:
+            with timed('recommend_consultants.fetch'):
+                answers = fetch_user_answers(conn, user_id)
+            if not answers:
+                logging.warning(f"No answers found for user_id {user_id}. Skipping recommendations.")
+                return
+
+            if not consultants:
+                logging.warning("No active consultants found. Skipping recommendations.")
+                return
+
+            with timed('recommend_consultants.score'):
+                recommendations = rank_consultants(signup_profile.parse_answers(answers), consultants)
+            logging.debug("Top 5 recommendations for user_id %s: %s", user_id, recommendations)
+
+            with timed('recommend_consultants.store'):
+                store_recommendations(conn, {user_id: recommendations}, datetime.now())
+            logging.info(f"Saved recommendations for user_id {user_id}")
     except Exception as e:
         logging.error(f"Error computing recommendations: {e}")
         # Do not raise error in production
 
+def rescore_all(chunk_size=RESCORE_CHUNK):
+    """
+    Recompute every user's top consultants against the current roster, e.g. after
+    consultants are added or change availability: one matrix-matrix product and
+    one write transaction per chunk of users.
+    """
+    consultants = fetch_consultants()
+    if not consultants:
+        logging.warning("No active consultants found. Skipping rescore.")
+        return 0
+    matrix = consultant_matrix(consultants)
+    with db.connection() as conn:
+        rows = conn.query("""
+            SELECT user_id, question_id, answer_text
+            FROM user_signup_answers
+            ORDER BY user_id, created_at DESC, id DESC
+        """)
+        users = []
+        for user_id, answers in groupby(rows, key=lambda row: row['user_id']):
+            try:
+                users.append((user_id, *create_user_vector(signup_profile.parse_answers(answers))))
+            except ValueError as e:
+                logging.error(f"Skipping user_id {user_id} with invalid answers: {e}")
+
+        now = datetime.now()
+        changed = 0
+        for start in range(0, len(users), chunk_size):
+            chunk = users[start:start + chunk_size]
+            with timed('recommend_consultants.score'):
+                scores = matrix.score([vector for _, vector, _ in chunk], [reasons for _, _, reasons in chunk])
+                recommendations_by_user = {
+                    user_id: [{'consultant_id': int(matrix.ids[j]), 'score': float(row[j])} for j in top_k(row, TOP_K)]
+                    for (user_id, _, _), row in zip(chunk, scores)
+                }
+            with timed('recommend_consultants.store'):
+                counts = store_recommendations(conn, recommendations_by_user, now)
+            changed += counts['inserted'] + counts['updated'] + counts['deleted']
+    logging.info(f"Rescored {len(users)} users against {len(consultants)} consultants ({changed} rows written)")
+    return len(users)
+
 if __name__ == "__main__":
     try:
+        if len(sys.argv) >= 2 and sys.argv[1] == 'rescore-all':
+            # Batch re-scoring of every user after a consultant roster change
+            start = time.perf_counter()
+            users = rescore_all()
+            print(json.dumps({'users': users, 'seconds': round(time.perf_counter() - start, 2)}))
+            sys.exit(0)
         if len(sys.argv) >= 2:
             user_id = int(sys.argv[1])
             logging.info(f"Starting recommendation process via CLI for user_id {user_id}")
@@ -151,7 +253,7 @@ if __name__ == "__main__":
             user_id = 1  # Change this to your test user ID
             logging.warning("No user_id passed via CLI. Using default user_id = 1 for testing.")
 
-        compute_recommendations(user_id)
+        analytics_client.run('compute_recommendations', user_id, compute_recommendations)
 
     except ValueError as e:
         logging.error(f"Invalid user_id format: {e}")
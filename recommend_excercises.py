@@ -1,65 +1,41 @@
-import pandas as pd
-import mysql.connector
+import numpy as np
 import sys
+import hashlib
 import logging
 import json
+from collections import Counter
 from datetime import datetime
+import analytics_client
+import bulk_writer
+import catalog_cache
+import db
+import log_config
+import signup_profile
+from log_config import timed
+from ranking import top_k
 
 # Set up logging
-logging.basicConfig(
-    filename='C:/xampp/htdocs/Companion/recommend_exercises.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+log_config.setup_logging('recommend_exercises')
 
-def get_db_connection():
+def fetch_user_signup_answers(conn, user_id):
     try:
-        conn = mysql.connector.connect(
-            host="127.0.0.1",
-            user="root",
-            password="",
-            database="companionx"
-        )
-        logging.info("Database connection successful")
-        return conn
-    except mysql.connector.Error as e:
-        logging.error(f"Database connection failed: {e}")
-        raise
-
-def fetch_user_signup_answers(user_id):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT question_id, answer_text
-            FROM user_signup_answers
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-        """, (user_id,))
-        answers = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        logging.info(f"Fetched {len(answers)} signup answers for user_id {user_id}")
+        answers = signup_profile.fetch_answers(conn, user_id)
+        logging.debug("Fetched %d signup answers for user_id %s", len(answers), user_id)
         return answers
     except Exception as e:
         logging.error(f"Error fetching user signup answers: {e}")
         return []
 
-def fetch_user_moods(user_id):
+def fetch_user_moods(conn, user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
+        moods = conn.query("""
             SELECT mood, intensity, created_at
             FROM user_mood_entries
             WHERE user_id = %s
             ORDER BY created_at DESC
             LIMIT 3
         """, (user_id,))
-        moods = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        logging.info(f"Fetched {len(moods)} moods for user_id {user_id}")
+        logging.debug("Fetched %d moods for user_id %s", len(moods), user_id)
         return moods
     except Exception as e:
         logging.error(f"Error fetching user moods: {e}")
@@ -67,144 +43,309 @@ def fetch_user_moods(user_id):
 
 def fetch_exercises():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, title, description, category FROM mental_exercises")
-        exercises = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        logging.info(f"Fetched {len(exercises)} mental exercises")
+        exercises = catalog_cache.exercises.all()
+        logging.debug("Fetched %d mental exercises", len(exercises))
         return exercises
     except Exception as e:
         logging.error(f"Error fetching exercises: {e}")
         return []
 
-def store_recommendations(user_id, recommendations):
+def store_recommendations(conn, user_id, recommendations):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        for rec in recommendations:
-            cursor.execute("""
-                INSERT INTO user_exercise_recommendations (user_id, exercise_id, recommended_at)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE recommended_at = %s
-            """, (user_id, rec['id'], datetime.now(), datetime.now()))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        logging.info(f"Stored {len(recommendations)} recommendations for user_id {user_id}")
+        bulk_writer.write_user_rows(conn, bulk_writer.EXERCISE_RECOMMENDATIONS,
+                                    {user_id: [(rec['id'],) for rec in recommendations]})
+        logging.debug("Stored %d recommendations for user_id %s", len(recommendations), user_id)
+        return True
     except Exception as e:
         logging.error(f"Error storing recommendations: {e}")
+        return False
 
-def recommend_exercises(user_id):
-    try:
-        answers = fetch_user_signup_answers(user_id)
-        moods = fetch_user_moods(user_id)
-        exercises = fetch_exercises()
-
-        if not answers or not exercises:
-            logging.warning(f"No answers or exercises for user_id {user_id}")
-            return []
-
-        # Define weights for scoring
-        weights = {
-            'mood': 0.4,
-            'intensity': 0.3,
-            'needs': 0.3
-        }
-
-        # Map signup answers to needs
-        needs_map = {
-            'Reduce stress': 'Stress',
-            'Manage anxiety': 'Anxiety',
-            'Deal with depression': 'Depression',
-            'Boost confidence': 'Mood',
-            'Overcome burnout': 'Stress',
-            'Improve sleep': 'Stress',
-            'Enhance emotional wellbeing': 'Mood',
-            'Find a counselor': 'CBT'
-        }
-
-        # Extract user needs from question_id 999
-        user_needs = []
-        question_scores = {}
-        for answer in answers:
-            if answer['question_id'] == 999:
-                needs = answer['answer_text'].split(", ")
-                for need in needs:
-                    need = need.strip()
-                    if need in needs_map:
-                        user_needs.append(needs_map[need])
-            elif answer['question_id'] in range(4, 13):
-                try:
-                    question_scores[answer['question_id']] = int(answer['answer_text'])
-                except ValueError:
-                    question_scores[answer['question_id']] = 5  # Default score
-
-        # Calculate average intensity from question scores (4-12)
-        avg_score = sum(question_scores.values()) / len(question_scores) if question_scores else 5
-
-        # Get dominant mood and intensity
-        dominant_mood = 'Neutral'
-        avg_mood_intensity = 5
-        if moods:
-            mood_counts = pd.Series([m['mood'] for m in moods]).mode()
-            dominant_mood = mood_counts[0] if not mood_counts.empty else 'Neutral'
-            avg_mood_intensity = sum(m['intensity'] for m in moods) / len(moods)
-
-        # Combine intensities (signup answers and mood entries)
-        combined_intensity = (avg_score + avg_mood_intensity) / 2
-
-        # Score exercises
-        recommendations = []
-        for exercise in exercises:
-            score = 0
-            category = exercise['category']
-
-            # Mood compatibility
-            if dominant_mood in ['Sad', 'Angry'] and category == 'CBT':
-                score += weights['mood'] * 0.8
-            elif dominant_mood == 'Neutral' and category == 'Mindfulness':
-                score += weights['mood'] * 0.7
-            elif dominant_mood in ['Happy', 'Excited'] and category == 'Gratitude':
-                score += weights['mood'] * 0.9
-
-            # Intensity adjustment
-            if combined_intensity >= 7 and category in ['Stress', 'Anxiety']:
-                score += weights['intensity'] * 0.7
-            elif combined_intensity <= 3 and category in ['Depression', 'Mood']:
-                score += weights['intensity'] * 0.8
-
-            # Needs matching
+# Define weights for scoring
+WEIGHTS = {
+    'mood': 0.4,
+    'intensity': 0.3,
+    'needs': 0.3
+}
+
+# Map signup answers to needs
+NEEDS_MAP = {
+    'Reduce stress': 'Stress',
+    'Manage anxiety': 'Anxiety',
+    'Deal with depression': 'Depression',
+    'Boost confidence': 'Mood',
+    'Overcome burnout': 'Stress',
+    'Improve sleep': 'Stress',
+    'Enhance emotional wellbeing': 'Mood',
+    'Find a counselor': 'CBT'
+}
+
+# Binary user signals derived from user_signals()
+SIGNALS = [
+    ('mood_negative', lambda s: s['dominant_mood'] in ['Sad', 'Angry']),
+    ('mood_neutral', lambda s: s['dominant_mood'] == 'Neutral'),
+    ('mood_positive', lambda s: s['dominant_mood'] in ['Happy', 'Excited']),
+    ('intensity_high', lambda s: s['combined_intensity'] >= 7),
+    ('intensity_low', lambda s: s['combined_intensity'] <= 3),
+]
+SIGNAL_NAMES = [name for name, _ in SIGNALS]
+
+# Category x signal weight table: an exercise scores the weights of its category's
+# active signals, plus WEIGHTS['needs'] / len(needs) for each need naming the category
+CATEGORY_WEIGHTS = {
+    'CBT': {'mood_negative': WEIGHTS['mood'] * 0.8},
+    'Mindfulness': {'mood_neutral': WEIGHTS['mood'] * 0.7},
+    'Gratitude': {'mood_positive': WEIGHTS['mood'] * 0.9},
+    'Stress': {'intensity_high': WEIGHTS['intensity'] * 0.7},
+    'Anxiety': {'intensity_high': WEIGHTS['intensity'] * 0.7},
+    'Depression': {'intensity_low': WEIGHTS['intensity'] * 0.8},
+    'Mood': {'intensity_low': WEIGHTS['intensity'] * 0.8},
+}
+
+TOP_K = 3
+
+def user_signals(profile, moods):
+    """
+    Everything exercise scoring needs to know about the user: dominant recent
+    mood, combined intensity and needs picked at signup (profile from
+    signup_profile.parse_answers).
+    """
+    # User needs from the question 999 checklist
+    user_needs = [NEEDS_MAP[reason] for reason in profile['reasons'] if reason in NEEDS_MAP]
+    # Ratings for questions 4-12, non-numeric answers counting as 5
+    question_scores = {question_id: 5 if rating is None else rating
+                       for question_id, rating in profile['ratings'].items()}
+
+    # Calculate average intensity from question scores (4-12)
+    avg_score = sum(question_scores.values()) / len(question_scores) if question_scores else 5
+
+    # Get dominant mood and intensity
+    dominant_mood = 'Neutral'
+    avg_mood_intensity = 5
+    if moods:
+        # Most frequent mood, ties going to the alphabetically first
+        mood_counts = Counter(m['mood'] for m in moods if m['mood'] is not None)
+        if mood_counts:
+            top_count = max(mood_counts.values())
+            dominant_mood = min(mood for mood, count in mood_counts.items() if count == top_count)
+        avg_mood_intensity = sum(m['intensity'] for m in moods) / len(moods)
+
+    # Combine intensities (signup answers and mood entries)
+    combined_intensity = (avg_score + avg_mood_intensity) / 2
+    return {'dominant_mood': dominant_mood, 'combined_intensity': combined_intensity, 'user_needs': user_needs}
+
+def signal_vector(signals):
+    return np.array([predicate(signals) for _, predicate in SIGNALS], dtype=np.float64)
+
+def category_score(signals, category):
+    """
+    Score of any exercise in category; it depends on nothing else about the exercise.
+    """
+    active = dict(zip(SIGNAL_NAMES, signal_vector(signals)))
+    score = sum(weight for signal, weight in CATEGORY_WEIGHTS.get(category, {}).items() if active[signal])
+    user_needs = signals['user_needs']
+    for need in user_needs:
+        if need == category:
+            score += WEIGHTS['needs'] * (1 / len(user_needs))
+    return min(score, 1.0)
+
+class ExerciseIndex:
+    """
+    One snapshot of the exercise catalog arranged for array scoring: the weight
+    table restricted to the catalog's categories, and the candidate exercises.
+    Exercises in a category all score the same, so only the first TOP_K of each
+    category (catalog order) can ever make a top TOP_K; the rest are never scored.
+    """
+
+    def __init__(self, exercises):
+        self.rows = exercises
+        self.categories = list(dict.fromkeys(exercise['category'] for exercise in exercises))
+        self.category_pos = {category: i for i, category in enumerate(self.categories)}
+        self.weights = np.array([[CATEGORY_WEIGHTS.get(category, {}).get(signal, 0.0) for signal in SIGNAL_NAMES]
+                                 for category in self.categories], dtype=np.float64).reshape(-1, len(SIGNALS))
+        taken = dict.fromkeys(self.categories, 0)
+        candidates = []
+        for position, exercise in enumerate(exercises):
+            if taken[exercise['category']] < TOP_K:
+                taken[exercise['category']] += 1
+                candidates.append(position)
+        self.candidates = np.array(candidates, dtype=np.int64)
+        self.candidate_category = np.array([self.category_pos[exercises[p]['category']] for p in candidates],
+                                           dtype=np.int64)
+
+    def category_scores(self, signals_list):
+        """
+        (users x categories) scores for many users with one matrix product.
+        """
+        scores = np.stack([signal_vector(signals) for signals in signals_list]) @ self.weights.T
+        for row, signals in zip(scores, signals_list):
+            user_needs = signals['user_needs']
+            # Added one need at a time, as the original per-exercise loop did
             for need in user_needs:
-                if need == category:
-                    score += weights['needs'] * (1 / len(user_needs) if user_needs else 1)
+                position = self.category_pos.get(need)
+                if position is not None:
+                    row[position] += WEIGHTS['needs'] * (1 / len(user_needs))
+        return np.minimum(scores, 1.0)
 
-            recommendations.append({
+    def recommendations(self, candidate_scores, picked):
+        top_recommendations = []
+        for i in picked:
+            exercise = self.rows[self.candidates[i]]
+            top_recommendations.append({
                 'id': exercise['id'],
                 'title': exercise['title'],
                 'description': exercise['description'],
                 'category': exercise['category'],
-                'score': min(score, 1.0),
+                'score': float(candidate_scores[i]),
                 'is_daily_task': False
             })
 
-        # Sort by score and select top 3
-        recommendations.sort(key=lambda x: x['score'], reverse=True)
-        top_recommendations = recommendations[:3]
-
         # Mark one exercise per category as daily task
         selected_categories = set()
         for rec in top_recommendations:
             if rec['category'] not in selected_categories:
                 rec['is_daily_task'] = True
                 selected_categories.add(rec['category'])
+        return top_recommendations
 
-        # Store recommendations in database
-        store_recommendations(user_id, top_recommendations)
+    def rank(self, signals):
+        candidate_scores = self.category_scores([signals])[0][self.candidate_category]
+        return self.recommendations(candidate_scores, top_k(candidate_scores, TOP_K))
 
-        logging.info(f"Recommended {len(top_recommendations)} exercises for user_id {user_id}")
-        return top_recommendations
+_index = None
+
+def exercise_index(exercises):
+    """
+    The index for the current catalog rows, rebuilt only when the catalog reloads.
+    """
+    global _index
+    index = _index
+    if index is None or index.rows is not exercises:
+        index = _index = ExerciseIndex(exercises)
+    return index
+
+def rank_exercises(signals, exercises):
+    """
+    Score every exercise for the user and return the top 3, one per category
+    marked as the daily task.
+    """
+    return exercise_index(exercises).rank(signals)
+
+# ---------------------- Change tracking ----------------------
+# A stored result stays valid while the user's answers and last three moods hash
+# the same and no category that could reach their top 3 has changed. Categories
+# scoring below the user's third-best score cannot, so edits there are ignored.
+
+_versions = None
+
+def inputs_fingerprint(answers, moods):
+    payload = json.dumps([
+        sorted((a['question_id'], a['answer_text']) for a in answers),
+        [(m['mood'], m['intensity'], str(m['created_at'])) for m in moods],
+    ], default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def category_versions(exercises):
+    """
+    {category: digest of its exercises}, cached until the catalog reloads.
+    """
+    global _versions
+    cached = _versions
+    if cached is not None and cached[0] is exercises:
+        return cached[1]
+    by_category = {}
+    for exercise in exercises:
+        by_category.setdefault(exercise['category'], []).append(
+            (exercise['id'], exercise['title'], exercise['description']))
+    versions = {category: hashlib.sha1(json.dumps(sorted(rows), default=str).encode('utf-8')).hexdigest()[:16]
+                for category, rows in by_category.items()}
+    _versions = (exercises, versions)
+    return versions
+
+def dependencies(signals, threshold, versions):
+    """
+    Versions of the categories that could place an exercise in the user's top 3.
+    threshold is the stored third-best score (None: fewer than 3, so all of them).
+    """
+    return {category: version for category, version in versions.items()
+            if threshold is None or category_score(signals, category) >= threshold}
+
+def load_cached(conn, user_id):
+    row = conn.query_one("""
+        SELECT inputs_hash, signals_json, threshold, deps_json, result_json
+        FROM exercise_recommendation_cache
+        WHERE user_id = %s
+    """, (user_id,))
+    if row is None:
+        return None
+    return {
+        'inputs_hash': row['inputs_hash'],
+        'signals': json.loads(row['signals_json']),
+        'threshold': row['threshold'],
+        'deps': json.loads(row['deps_json']),
+        'result': json.loads(row['result_json']),
+    }
+
+def save_cached(conn, user_id, fingerprint, signals, recommendations, versions):
+    threshold = recommendations[2]['score'] if len(recommendations) >= 3 else None
+    conn.upsert('exercise_recommendation_cache',
+                ['user_id', 'inputs_hash', 'signals_json', 'threshold', 'deps_json', 'result_json', 'computed_at'],
+                ['user_id'],
+                [(user_id, fingerprint, json.dumps(signals), threshold,
+                  json.dumps(dependencies(signals, threshold, versions)), json.dumps(recommendations, default=str),
+                  datetime.now())])
+
+def stale_users(conn, exercises):
+    """
+    Users whose stored recommendations depend on a category that has changed in
+    the current catalog; checked from the stored signals without refetching inputs.
+    """
+    versions = category_versions(exercises)
+    rows = conn.query("SELECT user_id, signals_json, threshold, deps_json FROM exercise_recommendation_cache",
+                      dictionary=False)
+    return [user_id for user_id, signals_json, threshold, deps_json in rows
+            if dependencies(json.loads(signals_json), threshold, versions) != json.loads(deps_json)]
+
+def recommend_exercises(user_id):
+    try:
+        # Catalog first (it may borrow its own connection to refresh), then one
+        # pooled connection for the rest of the recommendation
+        with timed('recommend_exercises.catalog'):
+            exercises = fetch_exercises()
+        with db.connection() as conn:
+            with timed('recommend_exercises.fetch'):
+                answers = fetch_user_signup_answers(conn, user_id)
+                moods = fetch_user_moods(conn, user_id)
+
+            if not answers or not exercises:
+                logging.warning(f"No answers or exercises for user_id {user_id}")
+                return []
+
+            fingerprint = inputs_fingerprint(answers, moods)
+            versions = category_versions(exercises)
+            try:
+                with timed('recommend_exercises.cache'):
+                    cached = load_cached(conn, user_id)
+                if cached and cached['inputs_hash'] == fingerprint \
+                        and dependencies(cached['signals'], cached['threshold'], versions) == cached['deps']:
+                    logging.debug("Serving stored exercise recommendations for user_id %s", user_id)
+                    return cached['result']
+            except Exception as e:
+                logging.error(f"Error reading cached exercise recommendations: {e}")
+
+            with timed('recommend_exercises.score'):
+                signals = user_signals(signup_profile.parse_answers(answers), moods)
+                top_recommendations = rank_exercises(signals, exercises)
+
+            with timed('recommend_exercises.store'):
+                try:
+                    # Only cache what actually reached user_exercise_recommendations
+                    if store_recommendations(conn, user_id, top_recommendations):
+                        save_cached(conn, user_id, fingerprint, signals, top_recommendations, versions)
+                except Exception as e:
+                    logging.error(f"Error caching exercise recommendations: {e}")
+
+            logging.info(f"Recommended {len(top_recommendations)} exercises for user_id {user_id}")
+            return top_recommendations
     except Exception as e:
         logging.error(f"Error recommending exercises: {e}")
         return []
@@ -214,9 +355,17 @@ if __name__ == "__main__":
         if len(sys.argv) < 2:
             logging.error("No user_id provided")
             sys.exit("Error: Please provide a user_id as a command-line argument")
+        if sys.argv[1] == 'refresh-stale':
+            # Without the daemon's work queue: recompute users hit by a catalog change (e.g. from cron)
+            with db.connection() as conn:
+                stale = stale_users(conn, fetch_exercises())
+            for stale_user_id in stale:
+                recommend_exercises(stale_user_id)
+            print(json.dumps({'refreshed': len(stale)}))
+            sys.exit(0)
         user_id = int(sys.argv[1])
         logging.info(f"Starting exercise recommendation for user_id {user_id}")
-        recommendations = recommend_exercises(user_id)
+        recommendations = analytics_client.run('recommend_exercises', user_id, recommend_exercises)
         print(json.dumps(recommendations, indent=2))
     except ValueError:
         logging.error("Invalid user_id format")
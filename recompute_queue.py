@@ -0,0 +1,71 @@
+import logging
+import os
+import queue
+import threading
+
+import catalog_cache
+
+RECOMPUTE_WORKERS = int(os.getenv('RECOMPUTE_WORKERS', '1'))
+
+
+class RecomputeQueue:
+    """
+    Background work queue for recomputations driven by data changes instead of
+    page loads. A job is a (name, arg) pair run by the handler registered under
+    name; a job that is already waiting is not queued twice.
+    """
+
+    def __init__(self, workers=RECOMPUTE_WORKERS, poll_interval=catalog_cache.CATALOG_CHECK_INTERVAL):
+        self.handlers = {}
+        self.jobs = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.done = 0
+        self.failed = 0
+
+    def register(self, name, handler):
+        self.handlers[name] = handler
+
+    def submit(self, name, arg=None):
+        job = (name, arg)
+        with self.lock:
+            if job in self.pending:
+                return False
+            self.pending.add(job)
+        self.jobs.put(job)
+        return True
+
+    def start(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f'recompute-{i}', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                job = self.jobs.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # Idle: check the catalogs so a change fans out without waiting for traffic
+                self._poll_catalogs()
+                continue
+            with self.lock:
+                # Released before running, so a change arriving mid-job queues it again
+                self.pending.discard(job)
+            name, arg = job
+            try:
+                self.handlers[name](arg)
+                self.done += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Recompute job {name}({arg}) failed: {e}")
+
+    def _poll_catalogs(self):
+        for catalog in catalog_cache.CATALOGS:
+            try:
+                catalog.refresh()
+            except Exception as e:
+                logging.error(f"Could not refresh the {catalog.name} catalog: {e}")
+
+    def stats(self):
+        return {'queued': self.jobs.qsize(), 'done': self.done, 'failed': self.failed}
@@ -1,78 +1,199 @@
-import mysql.connector
 from transformers import pipeline
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import time
+import logging
+import os
+
+import db
+import log_config
+from bulk_writer import BULK_CHUNK_SIZE
+from log_config import timed
+
+# The worker runs in a console, so its log also goes to stderr
+log_config.setup_logging('sentiment_analysis', console=True)
+
+# The model pipeline("sentiment-analysis") loads by default, pinned so upgrades can't swap it
+SENTIMENT_MODEL = os.getenv('SENTIMENT_MODEL', 'distilbert/distilbert-base-uncased-finetuned-sst-2-english')
+# Notes per forward pass, and the token limit longer notes are truncated to
+SENTIMENT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', '16'))
+SENTIMENT_MAX_LENGTH = int(os.getenv('SENTIMENT_MAX_LENGTH', '512'))
+# Entries fetched and processed per page, so memory stays bounded whatever the backlog
+SENTIMENT_PAGE_SIZE = int(os.getenv('SENTIMENT_PAGE_SIZE', '500'))
+# Analyzed results are written back once this many are buffered, or this many seconds after the first
+SENTIMENT_FLUSH_SIZE = int(os.getenv('SENTIMENT_FLUSH_SIZE', '500'))
+SENTIMENT_FLUSH_INTERVAL = float(os.getenv('SENTIMENT_FLUSH_INTERVAL', '5'))
+# This worker's row in worker_watermarks
+WATERMARK_NAME = 'sentiment_analysis'
+
+# Model label -> mood_status; anything else is neutral
+MOOD_STATUS = {'POSITIVE': 'happy', 'NEUTRAL': 'neutral', 'NEGATIVE': 'sad'}
+# A sad note above this confidence notifies the admin
+CRITICAL_CONFIDENCE = 0.8
 
 # Initialize the sentiment analysis pipeline
-sentiment_pipeline = pipeline("sentiment-analysis")
-
-# Database connection configuration
-db_config = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',  # Replace with your DB password
-    'database': 'companionx'  # Updated to match the new database name
-}
+sentiment_pipeline = pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+SCHEMA_STATEMENTS = [
+    # One column per statement so the same DDL works on SQLite
+    "ALTER TABLE mood_entries ADD COLUMN mood_status VARCHAR(20) DEFAULT NULL",
+    "ALTER TABLE mood_entries ADD COLUMN analyzed_at DATETIME DEFAULT NULL",
+    # Finds entries left unanalyzed below the watermark without a table scan
+    "CREATE INDEX idx_mood_entries_analyzed ON mood_entries (analyzed_at, id)",
+    """CREATE TABLE IF NOT EXISTS worker_watermarks (
+        worker VARCHAR(64) PRIMARY KEY,
+        last_id INT NOT NULL DEFAULT 0,
+        updated_at DATETIME
+    )""",
+]
+_schema_checked = False
 
 def modify_mood_entries_table():
     """
-    Add mood_status and analyzed_at columns to mood_entries table if they don't exist.
+    Add the mood_status and analyzed_at columns, their index and the watermark table
+    if they don't exist. Runs once per process.
     """
-    connection = mysql.connector.connect(**db_config)
-    cursor = connection.cursor()
-
-    # Add mood_status column
-    cursor.execute("""
-        ALTER TABLE mood_entries
-        ADD COLUMN mood_status VARCHAR(20) DEFAULT NULL,
-        ADD COLUMN analyzed_at DATETIME DEFAULT NULL
-    """)
-    connection.commit()
-
-    print("mood_entries table schema updated with mood_status and analyzed_at columns.")
+    global _schema_checked
+    if _schema_checked:
+        return
+    with db.connection() as connection:
+        for statement in SCHEMA_STATEMENTS:
+            try:
+                connection.execute(statement)
+            except Exception as e:
+                logging.debug("Schema statement skipped (may already exist): %s", e)
+    _schema_checked = True
 
-    cursor.close()
-    connection.close()
+    logging.info("mood_entries schema checked: mood_status, analyzed_at, index and watermark table.")
 
-def fetch_new_mood_entries():
+def load_watermark(connection, worker=WATERMARK_NAME):
     """
-    Fetch mood entries that haven't been analyzed yet.
+    Id of the last mood entry processed. On the first run, just below the oldest
+    unanalyzed entry (or the newest entry when everything is analyzed).
     """
-    connection = mysql.connector.connect(**db_config)
-    cursor = connection.cursor(dictionary=True)
-
-    query = "SELECT id, user_id, mood_note FROM mood_entries WHERE analyzed_at IS NULL"
-    cursor.execute(query)
-    entries = cursor.fetchall()
-
-    print(f"Fetched Entries: {entries}")  # Debug log
-
-    cursor.close()
-    connection.close()
-    return entries
-
-def update_mood_entry(entry_id, mood_status):
+    row = connection.query_one("SELECT last_id FROM worker_watermarks WHERE worker = %s", (worker,))
+    if row:
+        return row['last_id']
+    row = connection.query_one("SELECT MIN(id) AS first_id FROM mood_entries WHERE analyzed_at IS NULL")
+    if row['first_id'] is not None:
+        return row['first_id'] - 1
+    return connection.query_one("SELECT COALESCE(MAX(id), 0) AS last_id FROM mood_entries")['last_id']
+
+def save_watermark(connection, last_id, worker=WATERMARK_NAME):
+    connection.upsert('worker_watermarks', ['worker', 'last_id', 'updated_at'], ['worker'],
+                      [(worker, last_id, datetime.now())])
+
+def _entry_pages(connection, condition, params, after_id, page_size):
+    # Keyset paging: each page starts after the last id of the previous one
+    while True:
+        with timed('sentiment.fetch'):
+            page = connection.query(f"""
+                SELECT id, user_id, mood_note
+                FROM mood_entries
+                WHERE {condition} AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (*params, after_id, page_size))
+        if not page:
+            return
+        logging.info(f"Fetched {len(page)} unanalyzed mood entries after id {after_id}")
+        yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]['id']
+
+def stream_new_mood_entries(connection, watermark, page_size=SENTIMENT_PAGE_SIZE):
     """
-    Update the mood entry with the detected mood status and analysis timestamp.
+    Yield pages of mood entries that haven't been analyzed yet, in id order.
+    Entries at or below the watermark that are still unanalyzed (committed after it
+    moved past them, or left by a run that stopped mid-page) come first, then
+    everything above it.
     """
-    connection = mysql.connector.connect(**db_config)
-    cursor = connection.cursor()
+    yield from _entry_pages(connection, "analyzed_at IS NULL AND id <= %s", (watermark,), 0, page_size)
+    yield from _entry_pages(connection, "analyzed_at IS NULL", (), watermark, page_size)
 
-    query = """
-        UPDATE mood_entries
-        SET mood_status = %s, analyzed_at = %s
-        WHERE id = %s
+class ResultWriter:
+    """
+    Buffers analyzed mood statuses and writes them back on the worker's connection:
+    one UPDATE per status per chunk of ids, plus the watermark, in one transaction.
+    A flush either commits entirely or raises with the buffer intact; if the worker
+    dies first, the entries are still unanalyzed above the watermark and the next
+    cycle reads them again.
     """
-    cursor.execute(query, (mood_status, datetime.now(), entry_id))
-    connection.commit()
-
-    print(f"Updated Entry ID {entry_id} with mood_status = {mood_status} and analyzed_at = {datetime.now()}")  # Debug log
 
-    cursor.close()
-    connection.close()
+    def __init__(self, connection, watermark, flush_size=SENTIMENT_FLUSH_SIZE,
+                 flush_interval=SENTIMENT_FLUSH_INTERVAL, worker=WATERMARK_NAME):
+        self.connection = connection
+        self.worker = worker
+        self.watermark = watermark
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.results = []
+        self.alerts = []
+        self.last_id = watermark
+        self.first_buffered = None
+        self.stored = 0
+
+    def add(self, entry, mood_status, alert=False):
+        # Entries arrive in id order, so everything up to last_id is buffered or stored
+        if not self.results:
+            self.first_buffered = time.monotonic()
+        self.results.append((entry['id'], mood_status))
+        if alert:
+            self.alerts.append(entry)
+        self.last_id = max(self.last_id, entry['id'])
+        if (len(self.results) >= self.flush_size
+                or time.monotonic() - self.first_buffered >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if not self.results:
+            return
+        ids_by_status = {}
+        for entry_id, mood_status in self.results:
+            ids_by_status.setdefault(mood_status, []).append(entry_id)
+        now = datetime.now()
+        with timed('sentiment.store'), self.connection.transaction():
+            for mood_status, ids in ids_by_status.items():
+                for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                    chunk = ids[start:start + BULK_CHUNK_SIZE]
+                    self.connection.execute(f"""
+                        UPDATE mood_entries
+                        SET mood_status = %s, analyzed_at = %s
+                        WHERE id IN ({', '.join(['%s'] * len(chunk))})
+                    """, (mood_status, now, *chunk))
+            if self.last_id > self.watermark:
+                save_watermark(self.connection, self.last_id, self.worker)
+
+        self.watermark = max(self.watermark, self.last_id)
+        self.stored += len(self.results)
+        logging.info(f"Stored {len(self.results)} mood statuses up to Entry ID {self.watermark}")
+        alerts = self.alerts
+        self.results, self.alerts = [], []
+        # Only for committed results, so a retried batch doesn't notify twice
+        for entry in alerts:
+            logging.warning(f"Triggering email notification for User ID: {entry['user_id']}")
+            send_admin_notification(entry['user_id'], entry['mood_note'])
+
+def classify_notes(notes, batch_size=SENTIMENT_BATCH_SIZE, max_length=SENTIMENT_MAX_LENGTH):
+    """
+    Sentiment results ({'label', 'score'}) for notes, in input order. Notes are run
+    shortest first so each batch is padded only to a similar length, and anything
+    past max_length tokens is truncated.
+    """
+    if not notes:
+        return []
+    lengths = [len(ids) for ids in
+               sentiment_pipeline.tokenizer(notes, truncation=True, max_length=max_length)['input_ids']]
+    order = sorted(range(len(notes)), key=lengths.__getitem__)
+    ranked = sentiment_pipeline([notes[i] for i in order], batch_size=batch_size,
+                                truncation=True, max_length=max_length)
+    results = [None] * len(notes)
+    for i, result in zip(order, ranked):
+        results[i] = result
+    return results
 
 def send_admin_notification(user_id, mood_note):
     """
@@ -108,61 +229,65 @@ def send_admin_notification(user_id, mood_note):
             server.starttls()
             server.login(sender_email, sender_password)
             server.sendmail(sender_email, admin_email, msg.as_string())
-            print("Admin notification sent successfully!")
+            logging.info("Admin notification sent successfully!")
     except Exception as e:
-        print(f"Failed to send notification: {e}")
+        logging.error(f"Failed to send notification: {e}")
 
-def analyze_mood_entries():
+def analyze_page(entries, writer):
     """
-    Analyze new mood entries and update their mood status.
+    Analyze one page of mood entries and hand their mood status to the writer.
     """
-    # Ensure the table has the required columns
-    try:
-        modify_mood_entries_table()
-    except mysql.connector.Error as e:
-        print(f"Schema modification skipped (columns may already exist): {e}")
-
-    entries = fetch_new_mood_entries()
-
-    if not entries:
-        print("No new entries to analyze.")
-        return
+    pending = [entry for entry in entries if entry['mood_note'] and entry['mood_note'].strip() != ""]
+    with timed('sentiment.infer'):
+        results = classify_notes([entry['mood_note'] for entry in pending])
+    logging.info(f"Classified {len(pending)} mood notes")
+    results_by_id = {entry['id']: result for entry, result in zip(pending, results)}
 
     for entry in entries:
-        print(f"Analyzing Entry ID: {entry['id']} for User ID: {entry['user_id']}")
-        mood_note = entry['mood_note']
-        if not mood_note or mood_note.strip() == "":
-            print(f"Skipping Entry ID {entry['id']}: Empty or invalid mood_note")
-            update_mood_entry(entry['id'], "neutral")
+        result = results_by_id.get(entry['id'])
+        if result is None:
+            logging.info(f"Skipping Entry ID {entry['id']}: Empty or invalid mood_note")
+            writer.add(entry, "neutral")
             continue
-
-        result = sentiment_pipeline(mood_note)[0]
-        print(f"Sentiment Result for Entry ID {entry['id']}: {result}")  # Debug log
+        logging.debug("Sentiment Result for Entry ID %s: %s", entry['id'], result)
 
         sentiment = result['label']
         confidence = result['score']
 
         # Map sentiment to mood_status
-        if sentiment == "POSITIVE":
-            mood_status = "happy"
-        elif sentiment == "NEUTRAL":
-            mood_status = "neutral"
-        elif sentiment == "NEGATIVE":
-            mood_status = "sad"
-        else:
-            mood_status = "neutral"
-
-        update_mood_entry(entry['id'], mood_status)
+        mood_status = MOOD_STATUS.get(sentiment, "neutral")
 
         # Check for potential suicidal intent (sad mood with high confidence)
-        if mood_status == "sad" and confidence > 0.8:
-            print(f"Triggering email notification for User ID: {entry['user_id']}")
-            send_admin_notification(entry['user_id'], mood_note)
+        writer.add(entry, mood_status, alert=mood_status == "sad" and confidence > CRITICAL_CONFIDENCE)
+
+def analyze_mood_entries():
+    """
+    Analyze new mood entries page by page, writing results back in buffered batches
+    that move the watermark with them.
+    """
+    # Ensure the table has the required columns
+    modify_mood_entries_table()
+
+    # One pooled connection reads, writes and holds the watermark for the whole cycle
+    with db.connection() as connection:
+        watermark = load_watermark(connection)
+        writer = ResultWriter(connection, watermark)
+        for page in stream_new_mood_entries(connection, watermark):
+            analyze_page(page, writer)
+        writer.flush()
+
+    if not writer.stored:
+        logging.info("No new entries to analyze.")
 
 if __name__ == "__main__":
     while True:
-        print(f"\n[{datetime.now()}] Checking for new mood entries...")
-        analyze_mood_entries()
-        print(f"[{datetime.now()}] Sleeping for 3 minutes...\n")
+        logging.info("Checking for new mood entries...")
+        try:
+            analyze_mood_entries()
+        except Exception as e:
+            # Nothing past the last committed batch is marked analyzed, so the next cycle retries it
+            logging.error(f"Sentiment cycle failed: {e}")
+        if log_config.LOG_TIMINGS:
+            log_config.log_timings()
+        logging.info("Sleeping for 3 minutes...")
         time.sleep(18)  # Sleep for 180 seconds (3 minutes)
-
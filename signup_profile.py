@@ -0,0 +1,36 @@
+import logging
+
+# Onboarding rating questions (1-10) and the "what brings you here" checklist
+RATING_QUESTIONS = range(4, 13)
+REASONS_QUESTION = 999
+
+
+def fetch_answers(conn, user_id):
+    # Newest first: when the questionnaire was submitted more than once, the latest answer wins
+    return conn.query("""
+        SELECT question_id, answer_text
+        FROM user_signup_answers
+        WHERE user_id = %s
+        ORDER BY created_at DESC, id DESC
+    """, (user_id,))
+
+
+def parse_answers(answers):
+    """
+    Parse a user's signup answers (newest first) once for every recommender:
+    {'ratings': {question_id: int, or None if not a number}, 'reasons': [checklist items]}.
+    """
+    ratings = {}
+    reasons = None
+    for answer in answers:
+        question_id = answer['question_id']
+        if question_id == REASONS_QUESTION:
+            if reasons is None:
+                reasons = [reason.strip() for reason in answer['answer_text'].split(", ")]
+        elif question_id in RATING_QUESTIONS and question_id not in ratings:
+            try:
+                ratings[question_id] = int(answer['answer_text'])
+            except ValueError:
+                logging.warning(f"Non-numeric answer to question {question_id}: {answer['answer_text']!r}")
+                ratings[question_id] = None
+    return {'ratings': ratings, 'reasons': reasons or []}
@@ -0,0 +1,134 @@
+-- SQLite schema for the tables the Python analytics scripts use (DB_BACKEND=sqlite).
+-- Mirrors database.sql; create with `python db.py init-sqlite`.
+
+-- CONSULTANTS
+CREATE TABLE IF NOT EXISTS consultants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(100),
+    last_name VARCHAR(100),
+    specialization TEXT,
+    is_available BOOLEAN DEFAULT 1,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    tags TEXT,
+    status VARCHAR(20)
+);
+
+-- AI CONSULTANT RECOMMENDATIONS
+CREATE TABLE IF NOT EXISTS ai_consultant_recommendations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT,
+    consultant_id INT,
+    recommendation_score FLOAT,
+    recommended_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_ai_consultant_recommendations_user ON ai_consultant_recommendations (user_id, consultant_id);
+
+-- EXERCISE RECOMMENDATION CACHE
+CREATE TABLE IF NOT EXISTS exercise_recommendation_cache (
+    user_id INT PRIMARY KEY,
+    inputs_hash CHAR(40),
+    signals_json TEXT,
+    threshold DOUBLE,
+    deps_json TEXT,
+    result_json TEXT,
+    computed_at DATETIME
+);
+
+-- MENTAL EXERCISES
+CREATE TABLE IF NOT EXISTS mental_exercises (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title VARCHAR(255),
+    description TEXT,
+    category VARCHAR(100),
+    instructions TEXT,
+    duration INT,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+
+-- MOOD ENTRIES (journal notes analyzed by sentiment_analysis.py)
+CREATE TABLE IF NOT EXISTS mood_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT,
+    mood_emoji VARCHAR(20),
+    mood_title VARCHAR(255),
+    mood_note TEXT,
+    entry_date DATE,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    mood_status VARCHAR(20) DEFAULT NULL,
+    analyzed_at DATETIME DEFAULT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mood_entries_analyzed ON mood_entries (analyzed_at, id);
+
+-- WORKER WATERMARKS
+CREATE TABLE IF NOT EXISTS worker_watermarks (
+    worker VARCHAR(64) PRIMARY KEY,
+    last_id INT NOT NULL DEFAULT 0,
+    updated_at DATETIME
+);
+
+-- MOOD PREDICTION CACHE
+CREATE TABLE IF NOT EXISTS mood_prediction_cache (
+    user_id INT PRIMARY KEY,
+    mood VARCHAR(20),
+    stability INT,
+    message VARCHAR(255),
+    -- With entry_count, identifies the entries the prediction was made from
+    entry_count INT,
+    last_entry_id INT,
+    computed_at DATETIME
+);
+
+-- MOOD TASKS
+CREATE TABLE IF NOT EXISTS mood_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mood VARCHAR(20),
+    task_type VARCHAR(100),
+    description TEXT,
+    icon VARCHAR(100)
+);
+
+-- USER EXERCISE RECOMMENDATIONS
+CREATE TABLE IF NOT EXISTS user_exercise_recommendations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT,
+    exercise_id INT,
+    recommended_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, exercise_id)
+);
+
+-- USER MOOD ENTRIES
+CREATE TABLE IF NOT EXISTS user_mood_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT,
+    mood VARCHAR(20),
+    intensity INT,
+    notes TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_user_mood_entries_user_created ON user_mood_entries (user_id, created_at, id);
+
+-- USER MOOD STATE
+CREATE TABLE IF NOT EXISTS user_mood_state (
+    user_id INT PRIMARY KEY,
+    entry_count INT NOT NULL DEFAULT 0,
+    last_entry_id INT NOT NULL DEFAULT 0,
+    intensity_sum INT NOT NULL DEFAULT 0,
+    weekday_score_sum INT NOT NULL DEFAULT 0,
+    weekday_count INT NOT NULL DEFAULT 0,
+    weekend_score_sum INT NOT NULL DEFAULT 0,
+    weekend_count INT NOT NULL DEFAULT 0,
+    window_json TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- USER SIGNUP ANSWERS
+CREATE TABLE IF NOT EXISTS user_signup_answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT,
+    question_id INT,
+    answer_text TEXT,
+    created_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_user_signup_answers_user ON user_signup_answers (user_id);
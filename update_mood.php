@@ -2,6 +2,7 @@
 header('Content-Type: application/json');
 require_once 'config/db.php';
 require_once 'includes/session.php';
+require_once 'includes/analytics.php';
 
 if (!isset($_SESSION['user_id'])) {
     echo json_encode(['success' => false, 'error' => 'User not logged in']);
@@ -44,7 +45,7 @@ try {
     $pythonPath = "\"C:/Users/laptop universe/AppData/Local/Programs/Python/Python311/python.exe\"";
     $scriptPath = "\"C:/xampp/htdocs/Companion/predict_mood.py\"";
     $pythonScript = "$pythonPath $scriptPath " . escapeshellarg($userId);
-    $output = shell_exec($pythonScript . " 2>&1");
+    $output = runAnalytics('predict_mood', $userId, $pythonScript);
     
     if ($output) {
         $prediction = json_decode($output, true);
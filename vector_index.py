@@ -0,0 +1,121 @@
+import json
+import logging
+import math
+import os
+
+import faiss
+import numpy as np
+
+# Supported index types:
+#   flat       exact L2 scan over float32 vectors
+#   flat_fp16  exact scan over float16-compressed vectors (half the memory)
+#   ivf_flat   inverted file over float32 vectors, tuned with nprobe
+#   hnsw       HNSW graph over float32 vectors, tuned with ef_search
+#   ivf_pq     inverted file over product-quantized codes, tuned with nprobe
+INDEX_TYPES = ('flat', 'flat_fp16', 'ivf_flat', 'hnsw', 'ivf_pq')
+
+
+def default_nlist(n_vectors):
+    # ~4*sqrt(n) lists, but keep at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def default_pq_m(dimension):
+    # 8 dimensions per sub-quantizer; 384-d MiniLM vectors -> 48 bytes per vector
+    return dimension // 8 if dimension % 8 == 0 else dimension
+
+
+def create_index(index_type, vectors, nlist=None, hnsw_m=32, ef_construction=40, pq_m=None, pq_bits=8,
+                 train_size=None):
+    """
+    Build an index of the given type over `vectors` (float32, n x d) and add them.
+    IVF types are trained on at most `train_size` vectors sampled from the input.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(d)
+    elif index_type == 'flat_fp16':
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(d, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            if n < 2 ** pq_bits:
+                raise ValueError(f"ivf_pq needs at least {2 ** pq_bits} vectors to train, got {n}")
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m or default_pq_m(d), pq_bits)
+
+    if not index.is_trained:
+        sample = vectors
+        if train_size and n > train_size:
+            sample = vectors[np.random.default_rng(0).choice(n, train_size, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """
+    Apply query-time knobs; parameters that do not apply to the index type are ignored.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = int(nprobe)
+    if hasattr(index, 'hnsw') and ef_search:
+        index.hnsw.efSearch = int(ef_search)
+
+
+def _mmap_flags(index_type):
+    if index_type.startswith('ivf'):
+        # Inverted lists are mapped straight from the file
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Flat codes (also the HNSW storage) need a faiss build with IO_FLAG_MMAP_IFC
+    return getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def write_index(index, manifest, index_path, manifest_path):
+    """
+    Write the FAISS index and its manifest (id map, hashes, settings) atomically.
+    Replacing the files keeps workers that already mapped the old index on the old inode.
+    """
+    faiss.write_index(index, index_path + '.tmp')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(index_path + '.tmp', index_path)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def load_index(index_path, manifest_path, mmap=True, nprobe=None, ef_search=None):
+    """
+    Load a native FAISS index built by build_index.py, memory-mapped when possible so
+    several workers share the same pages. Search parameters default to the values stored
+    in the manifest. Returns (index, ids, manifest) where ids maps index positions back
+    to knowledge-base row ids.
+    """
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    index_type = manifest.get('index_type', 'flat')
+
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(index_path, _mmap_flags(index_type))
+        except RuntimeError as e:
+            logging.warning(f"Could not memory-map {index_path} ({e}); loading into memory")
+    if index is None:
+        index = faiss.read_index(index_path)
+
+    search = manifest.get('search_params', {})
+    set_search_params(index, nprobe or search.get('nprobe'), ef_search or search.get('ef_search'))
+
+    ids = np.asarray(manifest['ids'], dtype=np.int64)
+    logging.info(f"Loaded {index_type} index with {index.ntotal} vectors from {index_path}")
+    return index, ids, manifest